@@ -0,0 +1,61 @@
+"""
+Сравнение проверки запрещённых слов: цикл по словарю и матчер.
+
+Запуск из корня репозитория::
+
+    python benchmarks/bad_words.py --words 5000
+"""
+import argparse
+import random
+import sys
+import timeit
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "ya_news"))
+
+from news.moderation import BadWordMatcher  # noqa: E402
+
+ALPHABET = "абвгдежзийклмнопрстуфхцчшщыэюя"
+
+
+def random_word(rng, length):
+    return "".join(rng.choice(ALPHABET) for _ in range(length))
+
+
+def loop_search(words, text):
+    """Прежняя проверка из CommentForm.clean_text."""
+    lowered_text = text.lower()
+    for word in words:
+        if word in lowered_text:
+            return word
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--words", type=int, default=5000)
+    parser.add_argument("--text-words", type=int, default=80)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    words = [random_word(rng, rng.randint(5, 10)) for _ in range(args.words)]
+    text = " ".join(
+        random_word(rng, rng.randint(2, 8)) for _ in range(args.text_words)
+    )
+
+    started = timeit.default_timer()
+    matcher = BadWordMatcher(words)
+    build = timeit.default_timer() - started
+    assert bool(matcher.search(text)) == bool(loop_search(words, text))
+
+    loop = timeit.timeit(lambda: loop_search(words, text), number=args.repeat)
+    compiled = timeit.timeit(lambda: matcher.search(text), number=args.repeat)
+    print(f"слов в словаре: {args.words}, длина текста: {len(text)}")
+    print(f"сборка матчера: {build * 1000:.1f} мс")
+    print(f"цикл:    {loop / args.repeat * 1e6:.1f} мкс на комментарий")
+    print(f"матчер:  {compiled / args.repeat * 1e6:.1f} мкс на комментарий")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,383 @@
+"""
+Нагрузочный бенчмарк ya_news и ya_note.
+
+Для каждого проекта и масштаба (число комментариев или заметок)
+наполняет отдельную базу SQLite, затем гоняет сценарии запросов через
+тестовый клиент Django и через WSGI-приложение проекта. Каждый прогон
+идёт в своём процессе, чтобы пиковый RSS относился только к нему.
+Результаты — пропускная способность, перцентили задержки, число
+запросов к базе (из заголовка Server-Timing) и пиковый RSS — пишутся
+в JSON; два таких файла можно сравнить и найти регрессии.
+
+Запуск из корня репозитория::
+
+    python benchmarks/load.py run --scales 1000 10000 -o new.json
+    python benchmarks/load.py compare old.json new.json
+"""
+import argparse
+import json
+import platform
+import re
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from importlib import import_module
+from pathlib import Path
+from wsgiref.util import setup_testing_defaults
+
+import load_scenarios
+
+DEFAULT_DATA_DIR = Path(tempfile.gettempdir()) / "ya-benchmarks"
+QUERIES = re.compile(r'db;desc="(\d+) queries"')
+
+
+def client_sender(user):
+    """Запросы через django.test.Client."""
+    from django.test import Client
+
+    client = Client()
+    if user is not None:
+        client.force_login(user)
+
+    def send(path):
+        response = client.get(path)
+        if response.streaming:
+            for _ in response.streaming_content:
+                pass
+        return response.status_code, response.get("Server-Timing", "")
+
+    return send
+
+
+def wsgi_sender(project, user):
+    """Запросы напрямую в WSGI-приложение проекта (yanews.wsgi, ...)."""
+    from django.conf import settings
+    from django.test import Client
+
+    package = load_scenarios.PROJECTS[project][1]
+    application = import_module(f"{package}.wsgi").application
+    cookie = ""
+    if user is not None:
+        client = Client()
+        client.force_login(user)
+        session = client.cookies[settings.SESSION_COOKIE_NAME].value
+        cookie = f"{settings.SESSION_COOKIE_NAME}={session}"
+
+    def send(path):
+        path_info, _, query = path.partition("?")
+        environ = {
+            "PATH_INFO": path_info,
+            "QUERY_STRING": query,
+            "HTTP_COOKIE": cookie,
+        }
+        setup_testing_defaults(environ)
+        answer = {}
+
+        def start_response(status, headers, exc_info=None):
+            answer["status"] = int(status.split()[0])
+            answer["headers"] = dict(headers)
+
+        body = application(environ, start_response)
+        try:
+            for _ in body:
+                pass
+        finally:
+            body.close()
+        return answer["status"], answer["headers"].get("Server-Timing", "")
+
+    return send
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def measure(send, path, requests, warmup):
+    for _ in range(warmup):
+        send(path)
+    latencies = []
+    queries = []
+    started = time.perf_counter()
+    for _ in range(requests):
+        request_started = time.perf_counter()
+        status, server_timing = send(path)
+        latencies.append((time.perf_counter() - request_started) * 1000)
+        if status != 200:
+            raise RuntimeError(f"{path}: ответ {status}")
+        match = QUERIES.search(server_timing)
+        queries.append(int(match.group(1)) if match else None)
+    elapsed = time.perf_counter() - started
+    return {
+        "requests": requests,
+        "throughput_rps": round(requests / elapsed, 1),
+        "latency_ms": {
+            "mean": round(statistics.fmean(latencies), 3),
+            "p50": round(percentile(latencies, 0.5), 3),
+            "p95": round(percentile(latencies, 0.95), 3),
+            "p99": round(percentile(latencies, 0.99), 3),
+            "max": round(max(latencies), 3),
+        },
+        "queries": {
+            "median": (
+                statistics.median(queries) if None not in queries else None
+            ),
+            "max": max(queries) if None not in queries else None,
+        },
+    }
+
+
+def peak_rss_kb():
+    # На Linux ru_maxrss в килобайтах, на macOS — в байтах.
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss // 1024 if sys.platform == "darwin" else rss
+
+
+def child_seed(args):
+    load_scenarios.setup(args.project, args.db)
+    started = time.perf_counter()
+    load_scenarios.seed(args.project, args.scale)
+    return {
+        "seed_seconds": round(time.perf_counter() - started, 2),
+        "peak_rss_kb": peak_rss_kb(),
+    }
+
+
+def child_drive(args):
+    load_scenarios.setup(args.project, args.db)
+    import django
+
+    user, scenarios = load_scenarios.scenarios(args.project)
+    if args.driver == "client":
+        send = client_sender(user)
+    else:
+        send = wsgi_sender(args.project, user)
+    results = []
+    for name, path, weight in scenarios:
+        requests = max(3, int(args.requests * weight))
+        result = measure(send, path, requests, args.warmup)
+        results.append({"scenario": name, "path": path, **result})
+    return {
+        "django": django.get_version(),
+        "peak_rss_kb": peak_rss_kb(),
+        "results": results,
+    }
+
+
+def run_child(command, output, **options):
+    argv = [sys.executable, __file__, command, "--output", str(output)]
+    for option, value in options.items():
+        argv += [f"--{option.replace('_', '-')}", str(value)]
+    subprocess.run(argv, check=True)
+    return json.loads(output.read_text())
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+            cwd=load_scenarios.ROOT,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def seeded_db(args, project, scale, scratch):
+    """База проекта нужного масштаба; наполняется один раз."""
+    db = args.data_dir / f"{project}-{scale}.sqlite3"
+    if db.exists() and not args.reseed:
+        return db, None
+    args.data_dir.mkdir(parents=True, exist_ok=True)
+    fresh = db.with_suffix(".tmp")
+    fresh.unlink(missing_ok=True)
+    seeding = run_child(
+        "_seed",
+        scratch / "seed.json",
+        project=project,
+        scale=scale,
+        db=fresh,
+    )
+    fresh.replace(db)
+    print(f"{project} x{scale}: база наполнена за {seeding['seed_seconds']} с")
+    return db, seeding
+
+
+def run(args):
+    rows = []
+    meta = {
+        "started": datetime.now(timezone.utc).isoformat(),
+        "git": git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "requests": args.requests,
+    }
+    with tempfile.TemporaryDirectory() as scratch:
+        scratch = Path(scratch)
+        for project in args.projects:
+            for scale in args.scales:
+                db, seeding = seeded_db(args, project, scale, scratch)
+                for driver in args.drivers:
+                    report = run_child(
+                        "_drive",
+                        scratch / "drive.json",
+                        project=project,
+                        driver=driver,
+                        db=db,
+                        requests=args.requests,
+                        warmup=args.warmup,
+                    )
+                    meta["django"] = report["django"]
+                    for result in report["results"]:
+                        row = {
+                            "project": project,
+                            "scale": scale,
+                            "driver": driver,
+                            **result,
+                            "peak_rss_kb": report["peak_rss_kb"],
+                        }
+                        if seeding:
+                            row["seed_seconds"] = seeding["seed_seconds"]
+                        rows.append(row)
+                        print(format_row(row))
+    data = {"meta": meta, "results": rows}
+    args.output.write_text(json.dumps(data, ensure_ascii=False, indent=2))
+    print(f"Результаты записаны в {args.output}")
+    if args.baseline:
+        return compare_files(args.baseline, args.output, args.threshold)
+    return 0
+
+
+def format_row(row):
+    latency = row["latency_ms"]
+    return (
+        f"{row['project']:>5} x{row['scale']:<8} {row['driver']:<6} "
+        f"{row['scenario']:<20} {row['throughput_rps']:>8} req/s "
+        f"p50 {latency['p50']:>8.2f} p95 {latency['p95']:>8.2f} "
+        f"p99 {latency['p99']:>8.2f} мс, "
+        f"запросов {row['queries']['max']}, RSS {row['peak_rss_kb']} КБ"
+    )
+
+
+def row_key(row):
+    return row["project"], row["scale"], row["driver"], row["scenario"]
+
+
+def regressions(old, new, threshold):
+    """Ухудшения строки new относительно old."""
+    found = []
+    old_p95, new_p95 = old["latency_ms"]["p95"], new["latency_ms"]["p95"]
+    if new_p95 > old_p95 * (1 + threshold):
+        found.append(f"p95 {old_p95:.2f} -> {new_p95:.2f} мс")
+    old_rps, new_rps = old["throughput_rps"], new["throughput_rps"]
+    if new_rps * (1 + threshold) < old_rps:
+        found.append(f"пропускная способность {old_rps} -> {new_rps} req/s")
+    old_queries, new_queries = old["queries"]["max"], new["queries"]["max"]
+    if None not in (old_queries, new_queries) and new_queries > old_queries:
+        found.append(f"запросов {old_queries} -> {new_queries}")
+    if new["peak_rss_kb"] > old["peak_rss_kb"] * (1 + threshold):
+        found.append(
+            f"RSS {old['peak_rss_kb']} -> {new['peak_rss_kb']} КБ"
+        )
+    return found
+
+
+def compare_files(old_path, new_path, threshold):
+    old_rows = {
+        row_key(row): row
+        for row in json.loads(Path(old_path).read_text())["results"]
+    }
+    new_rows = json.loads(Path(new_path).read_text())["results"]
+    failed = 0
+    for row in new_rows:
+        old = old_rows.get(row_key(row))
+        name = " ".join(str(part) for part in row_key(row))
+        if old is None:
+            print(f"new   {name}")
+            continue
+        found = regressions(old, row, threshold)
+        if found:
+            failed += 1
+            print(f"WORSE {name}: {'; '.join(found)}")
+        else:
+            change = row["latency_ms"]["p95"] / old["latency_ms"]["p95"] - 1
+            print(f"ok    {name}: p95 {change:+.0%}")
+    print(f"Регрессий: {failed} (порог {threshold:.0%})")
+    return 1 if failed else 0
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description=__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="прогнать бенчмарк")
+    run_parser.add_argument(
+        "--projects",
+        nargs="+",
+        choices=tuple(load_scenarios.PROJECTS),
+        default=tuple(load_scenarios.PROJECTS),
+    )
+    run_parser.add_argument(
+        "--scales", nargs="+", type=int, default=(1000, 10000, 100000)
+    )
+    run_parser.add_argument(
+        "--drivers",
+        nargs="+",
+        choices=("client", "wsgi"),
+        default=("client", "wsgi"),
+    )
+    run_parser.add_argument("--requests", type=int, default=200)
+    run_parser.add_argument("--warmup", type=int, default=10)
+    run_parser.add_argument("--data-dir", type=Path, default=DEFAULT_DATA_DIR)
+    run_parser.add_argument(
+        "--reseed", action="store_true", help="наполнить базы заново"
+    )
+    run_parser.add_argument(
+        "-o", "--output", type=Path, default=Path("benchmark.json")
+    )
+    run_parser.add_argument(
+        "--baseline", type=Path, help="сравнить с прежними результатами"
+    )
+    run_parser.add_argument("--threshold", type=float, default=0.2)
+
+    compare_parser = commands.add_parser(
+        "compare", help="сравнить два файла результатов"
+    )
+    compare_parser.add_argument("old", type=Path)
+    compare_parser.add_argument("new", type=Path)
+    compare_parser.add_argument("--threshold", type=float, default=0.2)
+
+    for command in ("_seed", "_drive"):
+        child = commands.add_parser(command)
+        child.add_argument("--project", required=True)
+        child.add_argument("--db", type=Path, required=True)
+        child.add_argument("--output", type=Path, required=True)
+        child.add_argument("--scale", type=int)
+        child.add_argument("--driver")
+        child.add_argument("--requests", type=int)
+        child.add_argument("--warmup", type=int)
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    if args.command == "run":
+        return run(args)
+    if args.command == "compare":
+        return compare_files(args.old, args.new, args.threshold)
+    child = {"_seed": child_seed, "_drive": child_drive}[args.command]
+    args.output.write_text(json.dumps(child(args)))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
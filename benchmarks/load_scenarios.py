@@ -0,0 +1,216 @@
+"""
+Наполнение баз и сценарии запросов для benchmarks/load.py.
+
+Модуль работает внутри дочернего процесса, в котором настроен один
+из проектов: setup() подключает его настройки к отдельной базе.
+"""
+import os
+import random
+import sys
+from datetime import date, timedelta
+from pathlib import Path
+from urllib.parse import urlencode
+
+ROOT = Path(__file__).resolve().parent.parent
+PROJECTS = {
+    "news": ("ya_news", "yanews"),
+    "notes": ("ya_note", "yanote"),
+}
+SEED_BATCH_SIZE = 5000
+USERS = 50
+WORDS = (
+    "новость город погода спорт выборы рынок наука кино театр школа "
+    "дорога парк музей проект отчёт план идея список встреча задача"
+).split()
+
+
+def setup(project, db_path):
+    """Настраивает Django проекта project на базу db_path."""
+    directory, package = PROJECTS[project]
+    sys.path.insert(0, str(ROOT / directory))
+    os.environ["DJANGO_SETTINGS_MODULE"] = f"{package}.settings"
+    from django.conf import settings
+
+    settings.DATABASES["default"]["NAME"] = str(db_path)
+    # Файловый кэш у каждой базы свой и очищается при каждом запуске.
+    cache_settings = settings.CACHES["default"]
+    if cache_settings["BACKEND"].endswith("FileBasedCache"):
+        cache_settings["LOCATION"] = Path(db_path).with_suffix(".cache")
+    settings.DEBUG = False
+    settings.ALLOWED_HOSTS = ["testserver", "127.0.0.1", "localhost"]
+    settings.MONITORING_METRICS_DIR = None
+    settings.MONITORING_SLOW_QUERY_MS = None
+    settings.MONITORING_PROFILE_DIR = None
+    settings.LOGGING["loggers"]["monitoring"]["level"] = "WARNING"
+
+    import django
+
+    django.setup()
+    from django.core.cache import cache
+
+    cache.clear()
+
+
+def sentence(rng, words):
+    return " ".join(rng.choice(WORDS) for _ in range(words)).capitalize()
+
+
+def create_users(count):
+    from django.contrib.auth import get_user_model
+    from django.contrib.auth.hashers import make_password
+
+    User = get_user_model()
+    password = make_password(None)
+    User.objects.bulk_create(
+        User(username=f"user{number}", password=password)
+        for number in range(count)
+    )
+    return list(User.objects.order_by("id"))
+
+
+def seed_news(scale, rng):
+    """
+    scale комментариев к scale / 100 новостям (не меньше 20).
+
+    Десятая часть комментариев приходится на одну «горячую» новость.
+    """
+    from django.db import transaction
+
+    from news.models import Comment, News
+
+    news_count = max(scale // 100, 20)
+    today = date.today()
+    with transaction.atomic():
+        users = create_users(USERS)
+        News.objects.bulk_create(
+            (
+                News(
+                    title=sentence(rng, 3)[:50],
+                    text=sentence(rng, 40),
+                    date=today - timedelta(days=number // 5),
+                )
+                for number in range(news_count)
+            ),
+            batch_size=SEED_BATCH_SIZE,
+        )
+        news_ids = list(News.objects.values_list("id", flat=True))
+        hot = news_ids[0]
+        for start in range(0, scale, SEED_BATCH_SIZE):
+            Comment.objects.bulk_create(
+                Comment(
+                    news_id=hot if number % 10 == 0 else rng.choice(news_ids),
+                    author=rng.choice(users),
+                    text=sentence(rng, 12),
+                )
+                for number in range(start, min(start + SEED_BATCH_SIZE, scale))
+            )
+        News.objects.recount_comments()
+
+
+def seed_notes(scale, rng):
+    """
+    scale заметок поровну у 10 пользователей.
+
+    Каждая двадцатая заметка длинная и хранится сжатой.
+    """
+    from django.db import transaction
+
+    from notes.models import Note
+
+    with transaction.atomic():
+        users = create_users(10)
+        for start in range(0, scale, SEED_BATCH_SIZE):
+            Note.objects.bulk_create(
+                Note(
+                    title=sentence(rng, 3)[:100],
+                    text=(
+                        "\n\n".join(sentence(rng, 30) for _ in range(60))
+                        if number % 20 == 0
+                        else sentence(rng, 30)
+                    ),
+                    slug=f"note-{number}",
+                    author=users[number % len(users)],
+                )
+                for number in range(start, min(start + SEED_BATCH_SIZE, scale))
+            )
+
+
+def seed(project, scale):
+    from django.core.management import call_command
+
+    call_command("migrate", verbosity=0)
+    rng = random.Random(scale)
+    {"news": seed_news, "notes": seed_notes}[project](scale, rng)
+
+
+def news_scenarios():
+    """Сценарии ya_news: (имя, путь, вес числа запросов)."""
+    from django.urls import reverse
+
+    from news.models import Comment, News
+
+    hot = News.objects.order_by("-comment_count").first()
+    comments = Comment.objects.filter(news=hot).order_by("created", "id")
+    middle = comments[hot.comment_count // 2]
+    cursor = f"{middle.created.isoformat()}_{middle.pk}"
+    oldest = News.objects.order_by("date", "id").first()
+    home = reverse("news:home")
+    return None, [
+        ("home", home, 1),
+        (
+            "home_old_page",
+            f"{home}?{urlencode({'before': f'{oldest.date}_{oldest.pk}'})}",
+            1,
+        ),
+        ("detail", reverse("news:detail", args=(hot.pk,)), 1),
+        (
+            "comments_deep_page",
+            reverse("news:comments", args=(hot.pk,))
+            + "?"
+            + urlencode({"after": cursor}),
+            1,
+        ),
+        (
+            "archive_month",
+            reverse(
+                "news:archive_month",
+                kwargs={"year": hot.date.year, "month": hot.date.month},
+            ),
+            1,
+        ),
+        (
+            "search",
+            reverse("news:search") + "?" + urlencode({"q": WORDS[0]}),
+            1,
+        ),
+    ]
+
+
+def notes_scenarios():
+    """Сценарии ya_note от имени первого пользователя."""
+    from django.contrib.auth import get_user_model
+    from django.urls import reverse
+
+    from notes.models import Note
+
+    user = get_user_model().objects.order_by("id").first()
+    notes = Note.objects.filter(author=user).order_by("id")
+    count = notes.count()
+    middle = notes.values_list("id", flat=True)[count // 2]
+    long_note = notes.first()
+    note_list = reverse("notes:list")
+    return user, [
+        ("list", note_list, 1),
+        ("list_deep_page", f"{note_list}?after={middle}", 1),
+        ("detail_long", reverse("notes:detail", args=(long_note.slug,)), 1),
+        (
+            "autocomplete",
+            reverse("notes:autocomplete") + "?" + urlencode({"q": "Нов"}),
+            1,
+        ),
+        ("export_jsonl", reverse("notes:export") + "?format=jsonl", 0.05),
+    ]
+
+
+def scenarios(project):
+    return {"news": news_scenarios, "notes": notes_scenarios}[project]()
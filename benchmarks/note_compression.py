@@ -0,0 +1,64 @@
+"""
+Экономия места и стоимость чтения сжатого поля Note.text.
+
+Запуск из корня репозитория::
+
+    python benchmarks/note_compression.py --size 200000
+"""
+import argparse
+import random
+import sys
+import timeit
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "ya_note"))
+
+from notes.fields import compress_text, decompress_text  # noqa: E402
+
+LEVELS = ("DEBUG", "INFO", "WARNING", "ERROR")
+
+
+def make_log(rng, size):
+    """Текст, похожий на вставленный в заметку лог."""
+    lines = []
+    length = 0
+    while length < size:
+        line = (
+            f"2023-05-{rng.randint(1, 28):02d} "
+            f"{rng.randint(0, 23):02d}:{rng.randint(0, 59):02d}:"
+            f"{rng.randint(0, 59):02d} {rng.choice(LEVELS)} "
+            f"worker-{rng.randint(1, 8)} запрос {rng.randint(1, 10**6)} "
+            f"обработан за {rng.random():.3f} с"
+        )
+        lines.append(line)
+        length += len(line) + 1
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--size", type=int, default=200000)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    text = make_log(random.Random(0), args.size)
+    raw = text.encode()
+    stored = compress_text(text, threshold=4096)
+    assert decompress_text(stored) == text
+
+    plain_read = timeit.timeit(lambda: raw.decode(), number=args.repeat)
+    compressed_read = timeit.timeit(
+        lambda: decompress_text(stored), number=args.repeat
+    )
+    write = timeit.timeit(
+        lambda: compress_text(text, threshold=4096), number=args.repeat
+    )
+    print(f"исходный размер: {len(raw)} байт, сжатый: {len(stored)} байт")
+    print(f"экономия: {1 - len(stored) / len(raw):.1%}")
+    print(f"чтение без сжатия: {plain_read / args.repeat * 1e6:.0f} мкс")
+    print(f"чтение со сжатием: {compressed_read / args.repeat * 1e6:.0f} мкс")
+    print(f"сжатие при записи: {write / args.repeat * 1e6:.0f} мкс")
+
+
+if __name__ == "__main__":
+    main()
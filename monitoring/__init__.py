@@ -0,0 +1,6 @@
+"""
+Замеры производительности, общие для ya_news и ya_note.
+
+Пакет лежит в корне репозитория; settings.py обоих проектов добавляют
+корень в sys.path.
+"""
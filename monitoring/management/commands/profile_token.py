@@ -0,0 +1,20 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from monitoring.profiling import HEADER, MODES, QUERY_PARAM, make_token
+
+
+class Command(BaseCommand):
+    help = "Выдаёт токен, включающий профилирование отдельного запроса."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--mode", choices=MODES, default=MODES[0])
+
+    def handle(self, *args, **options):
+        token = make_token(options["mode"])
+        self.stdout.write(token)
+        self.stderr.write(
+            f"Заголовок {HEADER}: {token} или параметр ?{QUERY_PARAM}=... "
+            f"Токен действует {settings.MONITORING_PROFILE_MAX_AGE} с, "
+            f"профили пишутся в {settings.MONITORING_PROFILE_DIR}."
+        )
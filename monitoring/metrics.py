@@ -0,0 +1,290 @@
+"""
+Гистограммы времени ответа и числа запросов к базе по имени URL.
+
+Каждый поток каждого процесса пишет в свой файл, отображённый в память
+(mmap), поэтому запись обходится без блокировок. Файл завершившегося
+потока достаётся следующему новому потоку того же процесса, так что
+файлов у процесса не больше, чем одновременно живых потоков. Размер
+файла фиксирован: MAX_SLOTS имён URL, имена сверх лимита попадают в слот
+OVERFLOW_NAME. Эндпоинт метрик читает все файлы каталога
+MONITORING_METRICS_DIR и складывает их, а файлы завершившихся процессов
+удаляет: их счётчики пропадают из суммы, что Prometheus считает сбросом
+счётчика. Поэтому и оценки квантилей накоплены с запуска живых
+процессов, а не за последнее окно времени.
+"""
+import mmap
+import os
+import threading
+import weakref
+from bisect import bisect_left
+from collections import Counter, defaultdict
+from pathlib import Path
+
+from django.conf import settings
+
+# Границы корзин: 0.5 мс * 2^(i/4), до ~16 с. Четыре корзины на удвоение
+# дают ошибку оценки квантиля не больше ~10%.
+LATENCY_BUCKETS = tuple(0.0005 * 2 ** (i / 4) for i in range(61))
+QUERY_BUCKETS = (0, 1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024)
+QUANTILES = (0.5, 0.95, 0.99)
+
+MAX_SLOTS = 128
+OVERFLOW_NAME = "other"
+UNRESOLVED_NAME = "unresolved"
+NAME_SIZE = 64
+WORD_SIZE = 8
+
+# Раскладка слота в 64-битных словах.
+NAME_WORDS = NAME_SIZE // WORD_SIZE
+COUNT = NAME_WORDS
+LATENCY_SUM = COUNT + 1  # в микросекундах
+QUERY_SUM = LATENCY_SUM + 1
+LATENCY_START = QUERY_SUM + 1
+QUERY_START = LATENCY_START + len(LATENCY_BUCKETS) + 1
+SLOT_WORDS = QUERY_START + len(QUERY_BUCKETS) + 1
+FILE_SIZE = MAX_SLOTS * SLOT_WORDS * WORD_SIZE
+FILE_SUFFIX = ".metrics"
+
+
+class HistogramFile:
+    """Гистограммы одного потока; писать в файл может только он."""
+
+    def __init__(self, path):
+        with open(path, "a+b") as file:
+            file.truncate(FILE_SIZE)
+            self.map = mmap.mmap(file.fileno(), FILE_SIZE)
+        self.words = memoryview(self.map).cast("Q")
+        # Файл мог остаться от потока с тем же pid и ident: его слоты
+        # продолжают использоваться, а не затираются с начала.
+        self.slots = {}
+        for offset in range(0, MAX_SLOTS * SLOT_WORDS, SLOT_WORDS):
+            start = offset * WORD_SIZE
+            name = self.map[start:start + NAME_SIZE].rstrip(b"\0")
+            if not name:
+                break
+            self.slots[name.decode(errors="replace")] = offset
+
+    def slot(self, name):
+        """Смещение слота для имени; новые имена занимают свободные слоты."""
+        offset = self.slots.get(name)
+        if offset is not None:
+            return offset
+        if len(self.slots) == MAX_SLOTS - 1 and name != OVERFLOW_NAME:
+            return self.slot(OVERFLOW_NAME)
+        offset = len(self.slots) * SLOT_WORDS
+        encoded = name.encode()[:NAME_SIZE].ljust(NAME_SIZE, b"\0")
+        start = offset * WORD_SIZE
+        self.map[start:start + NAME_SIZE] = encoded
+        self.slots[name] = offset
+        return offset
+
+    def observe(self, name, seconds, queries):
+        words = self.words
+        offset = self.slot(name)
+        words[offset + COUNT] += 1
+        words[offset + LATENCY_SUM] += int(seconds * 1_000_000)
+        words[offset + QUERY_SUM] += queries
+        words[
+            offset + LATENCY_START + bisect_left(LATENCY_BUCKETS, seconds)
+        ] += 1
+        words[offset + QUERY_START + bisect_left(QUERY_BUCKETS, queries)] += 1
+
+
+class _FilePool:
+    """Файлы гистограмм процесса; освободившиеся отдаются новым потокам."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.free = defaultdict(list)
+        self.count = Counter()
+
+    def acquire(self, key):
+        with self.lock:
+            if self.free[key]:
+                return self.free[key].pop()
+            number = self.count[key]
+            self.count[key] += 1
+        pid, directory = key
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        return HistogramFile(directory / f"{pid}-{number}{FILE_SUFFIX}")
+
+    def release(self, key, histograms):
+        with self.lock:
+            self.free[key].append(histograms)
+
+
+_local = threading.local()
+_pool = _FilePool()
+
+
+def metrics_dir():
+    directory = settings.MONITORING_METRICS_DIR
+    return Path(directory) if directory else None
+
+
+def _histograms(directory):
+    """Файл гистограмм текущего потока; после fork берётся заново."""
+    key = (os.getpid(), directory)
+    if getattr(_local, "key", None) != key:
+        histograms = _pool.acquire(key)
+        weakref.finalize(
+            threading.current_thread(), _pool.release, key, histograms
+        )
+        _local.histograms = histograms
+        _local.key = key
+    return _local.histograms
+
+
+def observe(url_name, seconds, queries):
+    """Учитывает один запрос; без MONITORING_METRICS_DIR ничего не делает."""
+    directory = settings.MONITORING_METRICS_DIR
+    if not directory:
+        return
+    _histograms(directory).observe(
+        url_name or UNRESOLVED_NAME, seconds, queries
+    )
+
+
+def _is_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _file_pid(path):
+    pid = path.stem.split("-", 1)[0]
+    return int(pid) if pid.isdigit() else None
+
+
+def collect(directory):
+    """
+    Сумма гистограмм файлов каталога: {имя URL: список слов}.
+
+    Файлы завершившихся процессов удаляются и в сумму не входят.
+    """
+    totals = {}
+    for path in sorted(directory.glob(f"*{FILE_SUFFIX}")):
+        pid = _file_pid(path)
+        if pid is not None and not _is_alive(pid):
+            path.unlink(missing_ok=True)
+            continue
+        words = memoryview(path.read_bytes()).cast("Q")
+        for offset in range(0, len(words), SLOT_WORDS):
+            raw_name = words[offset:offset + NAME_WORDS].tobytes()
+            name = raw_name.rstrip(b"\0").decode(errors="replace")
+            if not name:
+                break
+            slot = words[offset:offset + SLOT_WORDS].tolist()
+            total = totals.setdefault(name, [0] * SLOT_WORDS)
+            for index in range(COUNT, SLOT_WORDS):
+                total[index] += slot[index]
+    return totals
+
+
+def quantile(bounds, counts, q):
+    """
+    Оценка квантиля по корзинам гистограммы.
+
+    Внутри корзины значения считаются распределёнными равномерно;
+    для последней, бесконечной корзины возвращается её нижняя граница.
+    """
+    total = sum(counts)
+    if not total:
+        return 0.0
+    rank = q * total
+    seen = 0
+    for index, count in enumerate(counts):
+        if count and seen + count >= rank:
+            if index == len(bounds):
+                return float(bounds[-1])
+            lower = bounds[index - 1] if index else 0.0
+            return lower + (bounds[index] - lower) * (rank - seen) / count
+        seen += count
+    return float(bounds[-1])
+
+
+def _histogram_lines(metric, labels, bounds, counts, total, count):
+    cumulative = 0
+    for bound, bucket in zip(bounds, counts):
+        cumulative += bucket
+        yield f'{metric}_bucket{{{labels},le="{bound:g}"}} {cumulative}'
+    yield f'{metric}_bucket{{{labels},le="+Inf"}} {count}'
+    yield f"{metric}_sum{{{labels}}} {total:g}"
+    yield f"{metric}_count{{{labels}}} {count}"
+
+
+def _escape(value):
+    return (
+        value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+    )
+
+
+def render_prometheus(totals):
+    """Метрики в текстовом формате Prometheus."""
+    series = {
+        "http_request_duration_seconds": (
+            "histogram",
+            "Время ответа по имени URL.",
+        ),
+        "http_request_queries": (
+            "histogram",
+            "Число запросов к базе по имени URL.",
+        ),
+        "http_request_duration_quantile_seconds": (
+            "gauge",
+            "Оценка квантилей времени ответа по гистограмме, накопленной"
+            " с запуска живых процессов, а не за окно времени.",
+        ),
+        "http_request_queries_quantile": (
+            "gauge",
+            "Оценка квантилей числа запросов по гистограмме, накопленной"
+            " с запуска живых процессов, а не за окно времени.",
+        ),
+    }
+    lines = {metric: [] for metric in series}
+    for name, words in sorted(totals.items()):
+        labels = f'view="{_escape(name)}"'
+        count = words[COUNT]
+        latency = words[LATENCY_START:QUERY_START]
+        queries = words[QUERY_START:SLOT_WORDS]
+        lines["http_request_duration_seconds"].extend(
+            _histogram_lines(
+                "http_request_duration_seconds",
+                labels,
+                LATENCY_BUCKETS,
+                latency,
+                words[LATENCY_SUM] / 1_000_000,
+                count,
+            )
+        )
+        lines["http_request_queries"].extend(
+            _histogram_lines(
+                "http_request_queries",
+                labels,
+                QUERY_BUCKETS,
+                queries,
+                words[QUERY_SUM],
+                count,
+            )
+        )
+        for q in QUANTILES:
+            quantile_labels = f'{labels},quantile="{q}"'
+            lines["http_request_duration_quantile_seconds"].append(
+                f"http_request_duration_quantile_seconds{{{quantile_labels}}}"
+                f" {quantile(LATENCY_BUCKETS, latency, q):.6f}"
+            )
+            lines["http_request_queries_quantile"].append(
+                f"http_request_queries_quantile{{{quantile_labels}}}"
+                f" {quantile(QUERY_BUCKETS, queries, q):g}"
+            )
+    output = []
+    for metric, (metric_type, help_text) in series.items():
+        output.append(f"# HELP {metric} {help_text}")
+        output.append(f"# TYPE {metric} {metric_type}")
+        output.extend(lines[metric])
+    return "\n".join(output) + "\n"
@@ -0,0 +1,117 @@
+import json
+import logging
+import time
+from contextlib import ExitStack
+
+from django.db import connections
+
+from . import metrics
+
+logger = logging.getLogger("monitoring.requests")
+
+
+class RequestTimings:
+    """
+    Замеры одного запроса.
+
+    Экземпляр подключается к соединениям с базой через
+    connection.execute_wrapper и считает запросы и время в базе.
+    Время шаблона — отрисовка TemplateResponse, включая запросы,
+    которые выполнили ленивые QuerySet в шаблоне.
+    """
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.queries = 0
+        self.db = 0.0
+        self.template = 0.0
+        self.render_start = None
+        self.total = None
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.db += time.perf_counter() - start
+
+    def start_render(self):
+        self.render_start = time.perf_counter()
+
+    def end_render(self, response):
+        self.template = time.perf_counter() - self.render_start
+
+    def finish(self):
+        self.total = time.perf_counter() - self.start
+
+    @property
+    def view(self):
+        return self.total - self.template
+
+    def server_timing(self):
+        """Значение заголовка Server-Timing; длительности в миллисекундах."""
+        return ", ".join(
+            (
+                f'db;desc="{self.queries} queries";dur={self.db * 1000:.1f}',
+                f"view;dur={self.view * 1000:.1f}",
+                f"tpl;dur={self.template * 1000:.1f}",
+                f"total;dur={self.total * 1000:.1f}",
+            )
+        )
+
+    def log_record(self, request, response):
+        match = request.resolver_match
+        return {
+            "method": request.method,
+            "path": request.path,
+            "url_name": match.view_name if match else None,
+            "status": response.status_code,
+            "queries": self.queries,
+            "db_ms": round(self.db * 1000, 2),
+            "view_ms": round(self.view * 1000, 2),
+            "template_ms": round(self.template * 1000, 2),
+            "total_ms": round(self.total * 1000, 2),
+        }
+
+
+class TimingMiddleware:
+    """
+    Число запросов к базе и время базы, view и шаблона для каждого запроса.
+
+    Результат отдаётся в заголовке Server-Timing и пишется одной
+    JSON-строкой в лог monitoring.requests, а также попадает в гистограммы
+    monitoring.metrics. Должен стоять первым
+    в MIDDLEWARE, чтобы замер охватывал остальные слои. Тело потоковых
+    ответов отдаётся после замера и в него не входит.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        timings = request.timings = RequestTimings()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(timings))
+            response = self.get_response(request)
+        timings.finish()
+        response["Server-Timing"] = timings.server_timing()
+        match = request.resolver_match
+        metrics.observe(
+            match.view_name if match else None,
+            timings.total,
+            timings.queries,
+        )
+        if logger.isEnabledFor(logging.INFO):
+            logger.info(
+                json.dumps(timings.log_record(request, response)),
+            )
+        return response
+
+    def process_template_response(self, request, response):
+        # Этот слой первый в MIDDLEWARE, поэтому вызывается последним,
+        # непосредственно перед отрисовкой шаблона.
+        request.timings.start_render()
+        response.add_post_render_callback(request.timings.end_render)
+        return response
@@ -0,0 +1,133 @@
+"""
+Профилирование отдельных запросов по подписанному флагу.
+
+Запрос профилируется, если в заголовке X-Profile или параметре _profile
+передан токен, подписанный SECRET_KEY (см. команду profile_token).
+Токен задаёт режим: cprofile пишет файл .prof для pstats/snakeviz,
+sample — файл .collapsed со стеками для flamegraph, снятыми
+сэмплирующим потоком. Файлы пишутся в MONITORING_PROFILE_DIR, в имени —
+имя URL. Остальные запросы не профилируются и почти ничего не стоят.
+"""
+import cProfile
+import logging
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+
+from django.conf import settings
+from django.core import signing
+
+logger = logging.getLogger("monitoring.profiling")
+
+HEADER = "X-Profile"
+QUERY_PARAM = "_profile"
+SALT = "monitoring.profiling"
+MODES = ("cprofile", "sample")
+SAMPLE_INTERVAL = 0.001
+
+
+def make_token(mode="cprofile"):
+    """Токен, включающий профилирование запроса в режиме mode."""
+    if mode not in MODES:
+        raise ValueError(f"Неизвестный режим профилирования: {mode}")
+    return signing.TimestampSigner(salt=SALT).sign(mode)
+
+
+def read_token(token):
+    """Режим из токена или None, если токен неверный или устарел."""
+    try:
+        mode = signing.TimestampSigner(salt=SALT).unsign(
+            token, max_age=settings.MONITORING_PROFILE_MAX_AGE
+        )
+    except signing.BadSignature:
+        return None
+    return mode if mode in MODES else None
+
+
+class StackSampler(threading.Thread):
+    """
+    Поток, который снимает стек другого потока через равные промежутки.
+
+    dump_stats повторяет интерфейс cProfile.Profile.
+    """
+
+    def __init__(self, thread_id, interval=SAMPLE_INTERVAL):
+        super().__init__(daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(
+                    f"{code.co_name} ({code.co_filename}:{frame.f_lineno})"
+                )
+                frame = frame.f_back
+            if stack:
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+
+    def dump_stats(self, path):
+        with open(path, "w") as file:
+            for stack, count in self.stacks.most_common():
+                file.write(f"{stack} {count}\n")
+
+
+class ProfilingMiddleware:
+    """
+    Профилирует запросы с подписанным токеном.
+
+    Без MONITORING_PROFILE_DIR ничего не делает. Путь к файлу профиля
+    возвращается в заголовке X-Profile-File.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token = request.headers.get(HEADER) or request.GET.get(QUERY_PARAM)
+        directory = settings.MONITORING_PROFILE_DIR
+        if not token or not directory:
+            return self.get_response(request)
+        mode = read_token(token)
+        if mode is None:
+            logger.warning("Неверный токен профилирования: %s", request.path)
+            return self.get_response(request)
+        if mode == "cprofile":
+            profiler = cProfile.Profile()
+            response = profiler.runcall(self.get_response, request)
+            suffix = ".prof"
+        else:
+            profiler = StackSampler(threading.get_ident())
+            profiler.start()
+            try:
+                response = self.get_response(request)
+            finally:
+                profiler.stop()
+            suffix = ".collapsed"
+        path = self.profile_path(request, Path(directory), suffix)
+        profiler.dump_stats(path)
+        response["X-Profile-File"] = path.name
+        logger.info("Профиль %s записан в %s", request.path, path)
+        return response
+
+    def profile_path(self, request, directory, suffix):
+        match = request.resolver_match
+        url_name = match.view_name.replace(":", ".") if match else "unknown"
+        stamp = time.strftime("%Y%m%dT%H%M%S")
+        directory.mkdir(parents=True, exist_ok=True)
+        return directory / (
+            f"{url_name}-{stamp}-{os.getpid()}-"
+            f"{time.perf_counter_ns()}{suffix}"
+        )
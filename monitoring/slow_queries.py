@@ -0,0 +1,156 @@
+"""
+Журнал медленных запросов к базе.
+
+Запрос дольше MONITORING_SLOW_QUERY_MS пишется в лог
+monitoring.slow_queries вместе с параметрами, именем URL и планом
+EXPLAIN QUERY PLAN из SQLite. Запросы, которые отличаются только
+значениями, сводятся к одному отпечатку: полная запись с планом
+делается один раз, дальше — короткие записи с числом повторов,
+когда оно достигает степени двойки.
+"""
+import hashlib
+import json
+import logging
+import re
+import threading
+import time
+from collections import OrderedDict
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger("monitoring.slow_queries")
+
+EXPLAINABLE = ("SELECT", "INSERT", "UPDATE", "DELETE", "WITH")
+
+STRING = re.compile(r"'(?:[^']|'')*'")
+NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+PLACEHOLDER_LIST = re.compile(r"\?(?:\s*,\s*\?)+")
+ROW_LIST = re.compile(r"\(\?\+?\)(?:\s*,\s*\(\?\+?\))+")
+SPACES = re.compile(r"\s+")
+
+
+def normalize(sql):
+    """SQL без значений: литералы и списки параметров заменены на ?."""
+    sql = STRING.sub("?", sql.replace("%s", "?"))
+    sql = NUMBER.sub("?", sql)
+    sql = PLACEHOLDER_LIST.sub("?+", sql)
+    sql = ROW_LIST.sub("(?+)+", sql)
+    return SPACES.sub(" ", sql).strip()
+
+
+def fingerprint(sql):
+    return hashlib.sha1(normalize(sql).encode()).hexdigest()[:16]
+
+
+def explain(connection, sql, params):
+    """
+    План запроса в виде дерева строк, как в консоли sqlite3.
+
+    Курсор берётся у драйвера напрямую, в обход execute_wrapper,
+    чтобы EXPLAIN не попадал в замеры и в этот же журнал.
+    """
+    if connection.vendor != "sqlite":
+        return None
+    if not sql.lstrip().upper().startswith(EXPLAINABLE):
+        return None
+    cursor = connection.create_cursor()
+    try:
+        cursor.execute(f"EXPLAIN QUERY PLAN {sql}", params)
+        rows = cursor.fetchall()
+    finally:
+        cursor.close()
+    depth = {0: -1}
+    plan = []
+    for node, parent, _, detail in rows:
+        depth[node] = depth.get(parent, -1) + 1
+        plan.append("  " * depth[node] + detail)
+    return plan
+
+
+class SlowQueryLog:
+    """Отпечатки медленных запросов процесса с числом повторов."""
+
+    def __init__(self, maxsize=1000):
+        self.maxsize = maxsize
+        self.counts = OrderedDict()
+        self.lock = threading.Lock()
+
+    def seen(self, key):
+        """Учитывает повтор отпечатка и возвращает число повторов."""
+        with self.lock:
+            count = self.counts.pop(key, 0) + 1
+            self.counts[key] = count
+            if len(self.counts) > self.maxsize:
+                self.counts.popitem(last=False)
+        return count
+
+    def clear(self):
+        with self.lock:
+            self.counts.clear()
+
+
+slow_query_log = SlowQueryLog()
+
+
+class SlowQueryRecorder:
+    """execute_wrapper, который записывает медленные запросы запроса."""
+
+    def __init__(self, request, threshold):
+        self.request = request
+        self.threshold = threshold
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - start
+            if duration >= self.threshold:
+                self.report(sql, params, many, context["connection"], duration)
+
+    def report(self, sql, params, many, connection, duration):
+        key = fingerprint(sql)
+        count = slow_query_log.seen(key)
+        if count & (count - 1):
+            return
+        match = self.request.resolver_match
+        record = {
+            "fingerprint": key,
+            "count": count,
+            "duration_ms": round(duration * 1000, 2),
+            "url_name": match.view_name if match else None,
+            "path": self.request.path,
+        }
+        if count == 1:
+            if many:
+                params = params[0] if params else None
+            record["sql"] = sql
+            record["params"] = [repr(param) for param in params or ()]
+            try:
+                record["plan"] = explain(connection, sql, params)
+            except Exception as error:
+                record["plan_error"] = str(error)
+        logger.warning(json.dumps(record, ensure_ascii=False))
+
+
+class SlowQueryMiddleware:
+    """
+    Пишет в журнал запросы к базе дольше MONITORING_SLOW_QUERY_MS.
+
+    При пустой настройке ничего не делает.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        threshold = settings.MONITORING_SLOW_QUERY_MS
+        if threshold is None:
+            return self.get_response(request)
+        recorder = SlowQueryRecorder(request, threshold / 1000)
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(recorder))
+            return self.get_response(request)
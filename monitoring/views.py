@@ -0,0 +1,23 @@
+from django.conf import settings
+from django.http import Http404, HttpResponse
+
+from .metrics import collect, metrics_dir, render_prometheus
+
+
+def metrics(request):
+    """
+    Метрики всех процессов в формате Prometheus.
+
+    Доступны только с адресов из INTERNAL_IPS.
+    """
+    directory = metrics_dir()
+    if (
+        directory is None
+        or request.META.get("REMOTE_ADDR") not in settings.INTERNAL_IPS
+    ):
+        raise Http404
+    totals = collect(directory) if directory.is_dir() else {}
+    return HttpResponse(
+        render_prometheus(totals),
+        content_type="text/plain; version=0.0.4; charset=utf-8",
+    )
@@ -1,7 +1,11 @@
+from functools import lru_cache
+
+from django.conf import settings
 from django.forms import ModelForm
 from django.core.exceptions import ValidationError
 
 from .models import Comment
+from .moderation import BadWordMatcher, load_words
 
 BAD_WORDS = (
     "редиска",
@@ -10,6 +14,25 @@ BAD_WORDS = (
 WARNING = "Не ругайтесь!"
 
 
+def get_bad_words():
+    """Слова из BAD_WORDS и словаря из настройки BAD_WORDS_FILE."""
+    words = list(BAD_WORDS)
+    if settings.BAD_WORDS_FILE:
+        words += load_words(settings.BAD_WORDS_FILE)
+    return words
+
+
+@lru_cache(maxsize=None)
+def get_bad_words_matcher():
+    """
+    Собирает поиск по запрещённым словам.
+
+    Результат кэшируется; после изменения словаря нужно вызвать
+    ``get_bad_words_matcher.cache_clear()``.
+    """
+    return BadWordMatcher(get_bad_words())
+
+
 class CommentForm(ModelForm):
     class Meta:
         model = Comment
@@ -18,8 +41,6 @@ class CommentForm(ModelForm):
     def clean_text(self):
         """Не позволяем ругаться в комментариях."""
         text = self.cleaned_data["text"]
-        lowered_text = text.lower()
-        for word in BAD_WORDS:
-            if word in lowered_text:
-                raise ValidationError(WARNING)
+        if get_bad_words_matcher().search(text):
+            raise ValidationError(WARNING)
         return text
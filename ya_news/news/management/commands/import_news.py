@@ -0,0 +1,204 @@
+import json
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from functools import partial
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from news.models import Comment, News, bump_news_versions
+
+User = get_user_model()
+
+
+@contextmanager
+def keep_created():
+    """Не даёт auto_now_add затереть дату импортированного комментария."""
+    field = Comment._meta.get_field("created")
+    field.auto_now_add = False
+    try:
+        yield
+    finally:
+        field.auto_now_add = True
+
+
+def parse_created(value, tz):
+    if not value:
+        return timezone.now()
+    try:
+        created = datetime.fromisoformat(value)
+    except ValueError:
+        created = parse_datetime(value)
+        if created is None:
+            raise CommandError(f"Некорректная дата комментария: {value}")
+    if timezone.is_naive(created):
+        return timezone.make_aware(created, tz)
+    return created
+
+
+def parse_news_date(value):
+    """Дата новости из строки ГГГГ-ММ-ДД или None, если она некорректна."""
+    try:
+        return parse_date(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class Command(BaseCommand):
+    help = (
+        "Импортирует новости с комментариями из JSONL-файла. "
+        'Каждая строка: {"title": ..., "text": ..., "date": "ГГГГ-ММ-ДД", '
+        '"comments": [{"author": <username>, "text": ..., '
+        '"created": <ISO 8601>}, ...]}.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="Путь к JSONL-файлу.")
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=5000,
+            help="Сколько строк таблиц вставлять в одной транзакции.",
+        )
+
+    def read_items(self, path):
+        """Разбирает файл построчно, не загружая его целиком."""
+        with open(path, encoding="utf-8") as file:
+            for number, line in enumerate(file, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    item = json.loads(line)
+                except json.JSONDecodeError as error:
+                    raise CommandError(f"Строка {number}: {error}")
+                problem = self.check_item(item)
+                if problem:
+                    raise CommandError(f"Строка {number}: {problem}")
+                yield item
+
+    def check_item(self, item):
+        """Причина, по которой новость нельзя импортировать, или None."""
+        if not isinstance(item, dict):
+            return "ожидался объект JSON"
+        for field in ("title", "text"):
+            if not isinstance(item.get(field), str) or not item[field]:
+                return f"нет поля {field}"
+        max_length = News._meta.get_field("title").max_length
+        if len(item["title"]) > max_length:
+            return f"заголовок длиннее {max_length} символов"
+        if item.get("date") and parse_news_date(item["date"]) is None:
+            return f"некорректная дата новости: {item['date']}"
+        for comment in item.get("comments", ()):
+            if not isinstance(comment, dict) or not (
+                comment.get("author") and comment.get("text")
+            ):
+                return "у комментария нет автора или текста"
+        return None
+
+    def flush(self, items):
+        """
+        Вставляет порцию новостей и комментариев в одной транзакции.
+
+        Первичные ключи новостей назначаются заранее: на SQLite
+        bulk_create не возвращает их, а они нужны комментариям.
+        Авторы всей порции находятся одним запросом.
+        """
+        usernames = {
+            comment["author"]
+            for item in items
+            for comment in item.get("comments", ())
+        }
+        authors = dict(
+            User.objects.filter(username__in=usernames).values_list(
+                "username", "pk"
+            )
+        )
+        tz = timezone.get_current_timezone()
+        rows = []
+        skipped = 0
+        for item in items:
+            news_comments = [
+                Comment(
+                    author_id=authors[comment["author"]],
+                    text=comment["text"],
+                    created=parse_created(comment.get("created"), tz),
+                )
+                for comment in item.get("comments", ())
+                if comment["author"] in authors
+            ]
+            skipped += len(item.get("comments", ())) - len(news_comments)
+            news = News(
+                title=item["title"],
+                text=item["text"],
+                comment_count=len(news_comments),
+            )
+            if item.get("date"):
+                news.date = parse_news_date(item["date"])
+            rows.append((news, news_comments))
+        news_list = [news for news, _ in rows]
+        comments = []
+        with transaction.atomic():
+            self.lock_for_write()
+            next_pk = (News.objects.aggregate(last=Max("pk"))["last"] or 0) + 1
+            for pk, (news, news_comments) in enumerate(rows, start=next_pk):
+                news.pk = pk
+                for comment in news_comments:
+                    comment.news_id = pk
+                comments += news_comments
+            News.objects.bulk_create(news_list)
+            with keep_created():
+                Comment.objects.bulk_create(comments)
+            # Id удалённых новостей могут достаться новым, а у них
+            # остались закэшированные фрагменты.
+            transaction.on_commit(
+                partial(bump_news_versions, [news.pk for news in news_list])
+            )
+        return len(news_list), len(comments), skipped
+
+    def lock_for_write(self):
+        """
+        Сразу берёт блокировку записи SQLite в открытой транзакции.
+
+        Без неё транзакция остаётся читающей до первого INSERT, и сайт
+        успевает вставить новость с тем же id, что прочитан из MAX(id).
+        Пустой UPDATE блокирует запись так же, как BEGIN IMMEDIATE.
+        """
+        News.objects.filter(pk=0).update(comment_count=0)
+
+    def iter_batches(self, items, batch_size):
+        """Собирает новости в порции примерно по batch_size строк таблиц."""
+        batch = []
+        rows = 0
+        for item in items:
+            batch.append(item)
+            rows += 1 + len(item.get("comments", ()))
+            if rows >= batch_size:
+                yield batch
+                batch = []
+                rows = 0
+        if batch:
+            yield batch
+
+    def handle(self, *args, **options):
+        news_total = comments_total = skipped_total = 0
+        started = time.monotonic()
+        batches = self.iter_batches(
+            self.read_items(options["path"]), options["batch_size"]
+        )
+        for batch in batches:
+            news, comments, skipped = self.flush(batch)
+            news_total += news
+            comments_total += comments
+            skipped_total += skipped
+        elapsed = time.monotonic() - started
+        total = news_total + comments_total
+        self.stdout.write(
+            f"Новостей: {news_total}, комментариев: {comments_total}, "
+            f"пропущено комментариев без автора: {skipped_total}, "
+            f"{total / elapsed if elapsed else 0:.0f} строк/с"
+        )
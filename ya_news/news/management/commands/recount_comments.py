@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from news.models import News
+
+
+class Command(BaseCommand):
+    help = "Пересчитывает счётчики комментариев у новостей."
+
+    def handle(self, *args, **options):
+        stale = News.objects.recount_comments()
+        self.stdout.write(f"Исправлено счётчиков: {stale}")
@@ -0,0 +1,115 @@
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand
+
+from news.forms import get_bad_words
+from news.models import RECOUNT_BATCH_SIZE, Comment, News
+from news.moderation import BadWordMatcher
+
+_matcher = None
+
+
+def _init_worker(words):
+    global _matcher
+    _matcher = BadWordMatcher(words)
+
+
+def _find_offenders(rows):
+    """Возвращает (id, news_id) комментариев с запрещёнными словами."""
+    return [
+        (pk, news_id) for pk, news_id, text in rows if _matcher.search(text)
+    ]
+
+
+class Command(BaseCommand):
+    help = (
+        "Заново проверяет все комментарии на запрещённые слова "
+        "и скрывает или удаляет нарушителей."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--delete",
+            action="store_true",
+            help="Удалять комментарии вместо того, чтобы скрывать их.",
+        )
+        parser.add_argument("--batch-size", type=int, default=2000)
+        parser.add_argument("--workers", type=int, default=os.cpu_count())
+
+    def iter_batches(self, batch_size):
+        """
+        Читает непроверенные комментарии порциями по первичному ключу.
+
+        Каждая порция выбирается отдельным запросом: SQLite не изолирует
+        открытый курсор от записи в ту же таблицу, а записи идут
+        одновременно с чтением.
+        """
+        queryset = Comment.objects.filter(flagged=False).order_by("pk")
+        last_pk = 0
+        while True:
+            batch = list(
+                queryset.filter(pk__gt=last_pk).values_list(
+                    "pk", "news_id", "text"
+                )[:batch_size]
+            )
+            if not batch:
+                return
+            last_pk = batch[-1][0]
+            yield batch
+
+    def apply(self, offenders, delete):
+        """Скрывает или удаляет нарушителей одним запросом."""
+        comments = Comment.objects.filter(pk__in=[pk for pk, _ in offenders])
+        if delete:
+            comments.delete()
+        else:
+            comments.update(flagged=True)
+
+    def recount(self, news_ids):
+        """
+        Пересчитывает счётчики новостей; фрагменты новостей с
+        изменившимся счётчиком сбрасывает recount_comments().
+
+        id передаются порциями: у SQLite ограничено число параметров
+        запроса, а нарушители могут найтись в любом числе новостей.
+        """
+        news_ids = sorted(news_ids)
+        for start in range(0, len(news_ids), RECOUNT_BATCH_SIZE):
+            batch = news_ids[start:start + RECOUNT_BATCH_SIZE]
+            News.objects.filter(pk__in=batch).recount_comments()
+
+    def handle(self, *args, **options):
+        words = get_bad_words()
+        workers = options["workers"]
+        checked = found = 0
+        news_ids = set()
+        started = time.monotonic()
+        pending = deque()
+        with ProcessPoolExecutor(
+            max_workers=workers, initializer=_init_worker, initargs=(words,)
+        ) as executor:
+            batches = self.iter_batches(options["batch_size"])
+            while True:
+                # Не держим в памяти больше порций, чем успевают проверить.
+                while len(pending) < workers * 2:
+                    batch = next(batches, None)
+                    if batch is None:
+                        break
+                    checked += len(batch)
+                    pending.append(executor.submit(_find_offenders, batch))
+                if not pending:
+                    break
+                offenders = pending.popleft().result()
+                if offenders:
+                    found += len(offenders)
+                    self.apply(offenders, options["delete"])
+                    news_ids.update(news_id for _, news_id in offenders)
+        self.recount(news_ids)
+        elapsed = time.monotonic() - started
+        self.stdout.write(
+            f"Проверено комментариев: {checked}, нарушителей: {found}, "
+            f"{checked / elapsed if elapsed else 0:.0f} комментариев/с"
+        )
@@ -0,0 +1,26 @@
+# Generated by Django 3.2.15 on 2026-10-18 17:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("news", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name="news",
+            options={
+                "ordering": ("-date", "-id"),
+                "verbose_name": "Новость",
+                "verbose_name_plural": "Новости",
+            },
+        ),
+        migrations.AddIndex(
+            model_name="news",
+            index=models.Index(
+                fields=["date", "id"], name="news_date_id_idx"
+            ),
+        ),
+    ]
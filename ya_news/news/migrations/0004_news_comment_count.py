@@ -0,0 +1,33 @@
+# Generated by Django 3.2.15 on 2026-10-18 17:09
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def fill_comment_count(apps, schema_editor):
+    News = apps.get_model("news", "News")
+    Comment = apps.get_model("news", "Comment")
+    counts = (
+        Comment.objects.filter(news=OuterRef("pk"))
+        .order_by()
+        .values("news")
+        .annotate(count=Count("pk"))
+        .values("count")
+    )
+    News.objects.update(comment_count=Coalesce(Subquery(counts), 0))
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("news", "0003_comment_news_created_index"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="news",
+            name="comment_count",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(fill_comment_count, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 3.2.15 on 2026-10-18 17:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("news", "0004_news_comment_count"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="comment",
+            name="flagged",
+            field=models.BooleanField(default=False, editable=False),
+        ),
+    ]
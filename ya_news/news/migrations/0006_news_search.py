@@ -0,0 +1,68 @@
+from django.db import migrations
+
+# Индекс FTS5 хранит только термины, сам текст берётся из news_news.
+# Триггеры держат индекс в актуальном состоянии при любой записи,
+# включая bulk_create и update(), которые не вызывают сигналы.
+# Пересоздание таблицы news_news в будущих миграциях удалит триггеры:
+# такую миграцию нужно дополнить повторным созданием триггеров.
+CREATE_SQL = (
+    """
+    CREATE VIRTUAL TABLE news_search USING fts5(
+        title,
+        text,
+        content='news_news',
+        content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER news_search_insert AFTER INSERT ON news_news BEGIN
+        INSERT INTO news_search(rowid, title, text)
+        VALUES (new.id, new.title, new.text);
+    END
+    """,
+    """
+    CREATE TRIGGER news_search_delete AFTER DELETE ON news_news BEGIN
+        INSERT INTO news_search(news_search, rowid, title, text)
+        VALUES ('delete', old.id, old.title, old.text);
+    END
+    """,
+    """
+    CREATE TRIGGER news_search_update AFTER UPDATE OF title, text
+    ON news_news BEGIN
+        INSERT INTO news_search(news_search, rowid, title, text)
+        VALUES ('delete', old.id, old.title, old.text);
+        INSERT INTO news_search(rowid, title, text)
+        VALUES (new.id, new.title, new.text);
+    END
+    """,
+    "INSERT INTO news_search(news_search) VALUES ('rebuild')",
+)
+DROP_SQL = (
+    "DROP TRIGGER IF EXISTS news_search_insert",
+    "DROP TRIGGER IF EXISTS news_search_delete",
+    "DROP TRIGGER IF EXISTS news_search_update",
+    "DROP TABLE IF EXISTS news_search",
+)
+
+
+def run_on_sqlite(statements):
+    def run(apps, schema_editor):
+        if schema_editor.connection.vendor != "sqlite":
+            return
+        for sql in statements:
+            schema_editor.execute(sql)
+
+    return run
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("news", "0005_comment_flagged"),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            run_on_sqlite(CREATE_SQL), run_on_sqlite(DROP_SQL)
+        ),
+    ]
@@ -1,16 +1,65 @@
+import time
 from datetime import datetime
+from functools import partial
 
 from django.conf import settings
-from django.db import models
+from django.core.cache import cache
+from django.db import models, transaction
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+NEWS_VERSION_KEY = "news:version:{}"
+# Не больше стольких id в одном IN (...): у SQLite ограничено число
+# параметров запроса.
+RECOUNT_BATCH_SIZE = 500
+
+
+class NewsQuerySet(models.QuerySet):
+    def recount_comments(self):
+        """
+        Пересчитывает счётчики комментариев одним запросом UPDATE.
+
+        Возвращает число новостей, у которых счётчик был неверным.
+        Обновление идёт в обход сигналов, поэтому версии фрагментов
+        исправленных новостей сбрасываются здесь же.
+        """
+        counts = Coalesce(
+            Subquery(
+                Comment.objects.filter(news=OuterRef("pk"), flagged=False)
+                .order_by()
+                .values("news")
+                .annotate(count=Count("pk"))
+                .values("count")
+            ),
+            0,
+        )
+        stale = list(
+            self.exclude(comment_count=counts).values_list("pk", flat=True)
+        )
+        for start in range(0, len(stale), RECOUNT_BATCH_SIZE):
+            News.objects.filter(
+                pk__in=stale[start:start + RECOUNT_BATCH_SIZE]
+            ).update(comment_count=counts)
+        if stale:
+            transaction.on_commit(partial(bump_news_versions, stale))
+        return len(stale)
 
 
 class News(models.Model):
     title = models.CharField(max_length=50)
     text = models.TextField()
     date = models.DateField(default=datetime.today)
+    comment_count = models.PositiveIntegerField(default=0, editable=False)
+
+    objects = NewsQuerySet.as_manager()
 
     class Meta:
-        ordering = ("-date",)
+        ordering = ("-date", "-id")
+        indexes = (
+            models.Index(fields=("date", "id"), name="news_date_id_idx"),
+        )
         verbose_name_plural = "Новости"
         verbose_name = "Новость"
 
@@ -26,9 +75,62 @@ class Comment(models.Model):
     )
     text = models.TextField()
     created = models.DateTimeField(auto_now_add=True)
+    flagged = models.BooleanField(default=False, editable=False)
 
     class Meta:
-        ordering = ("created",)
+        ordering = ("created", "id")
+        indexes = (
+            models.Index(
+                fields=("news", "created"), name="comment_news_created_idx"
+            ),
+        )
 
     def __str__(self):
         return self.text[:50]
+
+
+def get_news_versions(news_ids):
+    """
+    Возвращает версии новостей для ключей кэша фрагментов.
+
+    Если версии нет в кэше, заводится новая: закэшированный
+    с прежней версией фрагмент больше не будет использован.
+    """
+    keys = {news_id: NEWS_VERSION_KEY.format(news_id) for news_id in news_ids}
+    cached = cache.get_many(keys.values())
+    versions = {}
+    missing = {}
+    for news_id, key in keys.items():
+        if key in cached:
+            versions[news_id] = cached[key]
+        else:
+            versions[news_id] = missing[key] = time.time_ns()
+    if missing:
+        cache.set_many(missing, timeout=None)
+    return versions
+
+
+def bump_news_version(news_id):
+    """Сбрасывает закэшированные фрагменты новости."""
+    cache.set(NEWS_VERSION_KEY.format(news_id), time.time_ns(), timeout=None)
+
+
+def bump_news_versions(news_ids):
+    """Сбрасывает закэшированные фрагменты нескольких новостей."""
+    version = time.time_ns()
+    cache.set_many(
+        {NEWS_VERSION_KEY.format(news_id): version for news_id in news_ids},
+        timeout=None,
+    )
+
+
+@receiver(post_save, sender=News)
+@receiver(post_delete, sender=News)
+def news_changed(sender, instance, **kwargs):
+    transaction.on_commit(partial(bump_news_version, instance.pk))
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def comment_changed(sender, instance, **kwargs):
+    transaction.on_commit(partial(bump_news_version, instance.news_id))
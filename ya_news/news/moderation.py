@@ -0,0 +1,94 @@
+import re
+
+# Латинские буквы и цифры, которыми подменяют похожие кириллические.
+LOOKALIKES = str.maketrans(
+    {
+        "a": "а",
+        "b": "в",
+        "c": "с",
+        "e": "е",
+        "h": "н",
+        "k": "к",
+        "m": "м",
+        "o": "о",
+        "p": "р",
+        "t": "т",
+        "x": "х",
+        "y": "у",
+        "0": "о",
+        "3": "з",
+        "ё": "е",
+    }
+)
+
+
+def normalize(text):
+    """Приводит текст к нижнему регистру и кириллическому написанию."""
+    return text.lower().translate(LOOKALIKES)
+
+
+def _spellings():
+    """Для каждой кириллической буквы — все её написания в тексте."""
+    spellings = {}
+    for code, cyrillic in LOOKALIKES.items():
+        spellings.setdefault(cyrillic, cyrillic)
+        spellings[cyrillic] += chr(code)
+    return {
+        cyrillic: "[" + chars + "]" for cyrillic, chars in spellings.items()
+    }
+
+
+SPELLINGS = _spellings()
+
+
+def load_words(path):
+    """Читает словарь: одно слово на строку, ``#`` начинает комментарий."""
+    with open(path, encoding="utf-8") as file:
+        return [
+            line.strip()
+            for line in file
+            if line.strip() and not line.lstrip().startswith("#")
+        ]
+
+
+def _trie_pattern(node):
+    """
+    Собирает регулярное выражение из префиксного дерева.
+
+    Общие префиксы слов проверяются один раз, поэтому стоимость
+    поиска зависит от длины текста, а не от размера словаря.
+    Похожие латинские буквы учтены в самом выражении, так что
+    текст достаточно привести к нижнему регистру.
+    """
+    if "" in node:
+        # Более короткое слово уже найдено, продолжения не важны.
+        return ""
+    branches = [
+        (SPELLINGS.get(char) or re.escape(char)) + _trie_pattern(child)
+        for char, child in sorted(node.items())
+    ]
+    if len(branches) == 1:
+        return branches[0]
+    return "(?:" + "|".join(branches) + ")"
+
+
+class BadWordMatcher:
+    """Поиск запрещённых слов, скомпилированный один раз для словаря."""
+
+    def __init__(self, words):
+        trie = {}
+        for word in {normalize(word.strip()) for word in words}:
+            if not word:
+                continue
+            node = trie
+            for char in word:
+                node = node.setdefault(char, {})
+            node[""] = {}
+        self.pattern = re.compile(_trie_pattern(trie)) if trie else None
+
+    def search(self, text):
+        """Возвращает первое найденное запрещённое слово или None."""
+        if self.pattern is None:
+            return None
+        match = self.pattern.search(text.lower())
+        return normalize(match.group()) if match else None
@@ -0,0 +1,25 @@
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def cache_dir(settings, tmp_path):
+    """
+    Каждый тест пишет в свой файловый кэш.
+
+    Так закэшированные фрагменты не переходят между тестами, а кэш
+    запущенного рядом сервера и параллельных прогонов не затрагивается.
+    """
+    settings.CACHES = {
+        "default": {
+            **settings.CACHES["default"],
+            "LOCATION": tmp_path / "cache",
+        }
+    }
+    return settings.CACHES["default"]["LOCATION"]
+
+
+@pytest.fixture(autouse=True)
+def metrics_dir(settings, tmp_path):
+    """Гистограммы каждого теста пишутся в отдельный каталог."""
+    settings.MONITORING_METRICS_DIR = tmp_path / "metrics"
+    return settings.MONITORING_METRICS_DIR
@@ -1,10 +1,15 @@
 import pytest
 
 from django.conf import settings
-from django.contrib.auth.models import User
+from django.contrib.auth.models import AnonymousUser, User
+from django.db import connection
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
+from monitoring.slow_queries import explain
 from news.models import News, Comment
+from news.views import news_detail_etag
 
 
 NEWS_HOME = "news:home"
@@ -75,3 +80,229 @@ def test_comment_form_availability(client, user_fixture, news_fixture):
     client.login(username=user_fixture.username, password="12345")
     response = client.get(reverse(NEWS_DETAIL, kwargs={"pk": news.pk}))
     assert "form" in response.context
+
+
+@pytest.mark.django_db
+def test_home_page_comment_count(client, comments_fixture):
+    news = comments_fixture[0].news
+    News.objects.filter(pk=news.pk).update(
+        comment_count=len(comments_fixture)
+    )
+    response = client.get(reverse(NEWS_HOME))
+    counts = {
+        item.pk: item.comment_count
+        for item in response.context["object_list"]
+    }
+    assert counts[news.pk] == len(comments_fixture)
+    assert "Комментариев: 5" in response.content.decode()
+
+
+@pytest.mark.django_db
+def test_home_page_cost_does_not_grow_with_comments(
+    client, django_assert_num_queries, news_fixture, user_fixture
+):
+    news = news_fixture[0]
+    Comment.objects.create(news=news, author=user_fixture, text="Comment")
+    with django_assert_num_queries(1):
+        response = client.get(reverse(NEWS_HOME))
+    for item in response.context["object_list"]:
+        assert not hasattr(item, "_prefetched_objects_cache")
+
+    Comment.objects.bulk_create(
+        Comment(news=news, author=user_fixture, text=f"Comment {i}")
+        for i in range(500)
+    )
+    with django_assert_num_queries(1):
+        response = client.get(reverse(NEWS_HOME))
+    for item in response.context["object_list"]:
+        assert not hasattr(item, "_prefetched_objects_cache")
+
+
+@pytest.mark.django_db
+def test_older_news_cursor(client, news_fixture):
+    for i in range(3):
+        News.objects.create(title=f"Old News {i}", text="Old content")
+    response = client.get(reverse(NEWS_HOME))
+    first_page = list(response.context["object_list"])
+    next_cursor = response.context["next_cursor"]
+    assert next_cursor
+    response = client.get(reverse(NEWS_HOME), {"before": next_cursor})
+    second_page = list(response.context["object_list"])
+    assert response.context["next_cursor"] is None
+    assert first_page + second_page == list(
+        News.objects.order_by("-date", "-id")
+    )
+
+
+@pytest.mark.django_db
+def test_older_news_cost_does_not_grow_with_depth(
+    client, django_assert_num_queries, news_fixture
+):
+    for news in News.objects.order_by("-date", "-id")[1:]:
+        with django_assert_num_queries(1):
+            response = client.get(
+                reverse(NEWS_HOME),
+                {"before": f"{news.date.isoformat()}_{news.pk}"},
+            )
+        assert news not in response.context["object_list"]
+
+
+@pytest.mark.django_db
+def test_archive_reads_only_one_page(client, news_fixture):
+    for i in range(30):
+        News.objects.create(title=f"Old News {i}", text="Old content")
+    date = news_fixture[0].date
+    url = reverse("news:archive_month", args=(date.year, date.month))
+    with CaptureQueriesContext(connection) as queries:
+        response = client.get(url)
+    assert response.status_code == 200
+    assert len(response.context["object_list"]) == (
+        settings.NEWS_COUNT_ON_HOME_PAGE
+    )
+    news_selects = [
+        query["sql"]
+        for query in queries
+        if 'FROM "news_news"' in query["sql"]
+        and '"news_news"."text"' in query["sql"]
+    ]
+    assert len(news_selects) == 1
+    assert "LIMIT" in news_selects[0]
+
+
+@pytest.mark.django_db
+def test_empty_archive_returns_not_found(client, news_fixture):
+    date = news_fixture[0].date
+    response = client.get(
+        reverse("news:archive_month", args=(date.year - 1, date.month))
+    )
+    assert response.status_code == 404
+
+
+@pytest.mark.django_db
+def test_comments_paginated_by_cursor(client, settings, comments_fixture):
+    settings.COMMENTS_COUNT_ON_DETAIL_PAGE = 2
+    news = comments_fixture[0].news
+    url = reverse(NEWS_DETAIL, kwargs={"pk": news.pk})
+    shown = []
+    cursor = None
+    while True:
+        response = client.get(url, {"after": cursor} if cursor else {})
+        page = response.context["comments"]
+        assert len(page) <= settings.COMMENTS_COUNT_ON_DETAIL_PAGE
+        shown += page
+        cursor = response.context["next_comments_cursor"]
+        if cursor is None:
+            break
+    assert shown == list(news.comment_set.order_by("created", "id"))
+
+
+@pytest.mark.django_db
+def test_comments_load_more_json(client, settings, comments_fixture):
+    settings.COMMENTS_COUNT_ON_DETAIL_PAGE = 3
+    news = comments_fixture[0].news
+    response = client.get(reverse(NEWS_DETAIL, kwargs={"pk": news.pk}))
+    cursor = response.context["next_comments_cursor"]
+    response = client.get(
+        reverse("news:comments", kwargs={"pk": news.pk}), {"after": cursor}
+    )
+    data = response.json()
+    assert [comment["id"] for comment in data["comments"]] == [
+        comment.pk for comment in comments_fixture[3:]
+    ]
+    assert data["next_cursor"] is None
+    assert comments_fixture[3].text in data["comments"][0]["html"]
+
+
+@pytest.mark.django_db
+def test_detail_page_cost_does_not_grow_with_comments(
+    client, django_assert_num_queries, settings, comments_fixture
+):
+    settings.COMMENTS_COUNT_ON_DETAIL_PAGE = 2
+    news = comments_fixture[0].news
+    Comment.objects.bulk_create(
+        Comment(news=news, author=comments_fixture[0].author, text="Comment")
+        for _ in range(200)
+    )
+    with django_assert_num_queries(3):
+        response = client.get(reverse(NEWS_DETAIL, kwargs={"pk": news.pk}))
+    assert len(response.context["comments"]) == 2
+
+
+@pytest.mark.django_db
+def test_detail_etag_cost_does_not_grow_with_comments(comments_fixture):
+    """ETag считается без агрегатов: поиском по индексам, а не обходом."""
+    news = comments_fixture[0].news
+    Comment.objects.bulk_create(
+        Comment(news=news, author=comments_fixture[0].author, text="Comment")
+        for _ in range(200)
+    )
+    request = RequestFactory().get("/")
+    request.user = AnonymousUser()
+    with CaptureQueriesContext(connection) as queries:
+        etag = news_detail_etag(request, news.pk)
+    assert etag
+    assert len(queries) == 1
+    sql = queries[0]["sql"]
+    assert "COUNT(" not in sql and "MAX(" not in sql
+    plan = explain(connection, sql, ())
+    for step in plan:
+        assert "SCAN" not in step and "TEMP B-TREE" not in step
+    assert any("comment_news_created_idx" in step for step in plan)
+
+
+@pytest.mark.django_db
+def test_home_page_fragment_invalidation(
+    client, django_capture_on_commit_callbacks, news_fixture, user_fixture
+):
+    news = news_fixture[0]
+    client.get(reverse(NEWS_HOME))
+    News.objects.filter(pk=news.pk).update(title="Changed quietly")
+    response = client.get(reverse(NEWS_HOME))
+    assert "Changed quietly" not in response.content.decode()
+
+    with django_capture_on_commit_callbacks(execute=True):
+        news.title = "Changed title"
+        news.save()
+    response = client.get(reverse(NEWS_HOME))
+    assert "Changed title" in response.content.decode()
+
+    with django_capture_on_commit_callbacks(execute=True):
+        Comment.objects.create(news=news, author=user_fixture, text="Text")
+        News.objects.filter(pk=news.pk).update(comment_count=1)
+    response = client.get(reverse(NEWS_HOME))
+    assert "Комментариев: 1" in response.content.decode()
+
+
+@pytest.mark.django_db
+def test_search_ranks_and_highlights(client):
+    in_text = News.objects.create(
+        title="Погода", text="Завтра в городе ожидается <b>снегопад</b>"
+    )
+    in_title = News.objects.create(
+        title="Снегопад в Москве", text="Дороги засыпало снегом"
+    )
+    News.objects.create(title="Футбол", text="Матч перенесли")
+    response = client.get(reverse("news:search"), {"q": "снегопад"})
+    results = response.context["results"]
+    assert results == [in_title, in_text]
+    assert "<mark>Снегопад</mark>" in results[0].title_highlight
+    assert "&lt;b&gt;<mark>снегопад</mark>" in results[1].text_snippet
+
+
+@pytest.mark.django_db
+def test_search_index_follows_changes(client, news_fixture):
+    news = news_fixture[0]
+    news.title = "Уникальный заголовок"
+    news.save()
+    response = client.get(reverse("news:search"), {"q": "уникальн"})
+    assert response.context["results"] == [news]
+
+    news.delete()
+    response = client.get(reverse("news:search"), {"q": "уникальн"})
+    assert response.context["results"] == []
+
+
+@pytest.mark.django_db
+def test_search_ignores_query_syntax(client, news_fixture):
+    response = client.get(reverse("news:search"), {"q": '"NEAR( AND *'})
+    assert response.status_code == 200
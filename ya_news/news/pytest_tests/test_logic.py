@@ -1,11 +1,18 @@
+import json
 import random
+from io import StringIO
+
 import pytest
 
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django.contrib.auth.models import User
 
 from news.models import News, Comment
-from news.forms import BAD_WORDS, WARNING
+from news.forms import BAD_WORDS, WARNING, get_bad_words_matcher
 
 NEWS_EDIT = "news:edit"
 NEWS_DELETE = "news:delete"
@@ -110,3 +117,222 @@ def test_authorized_user_cannot_delete_others_comments(
     initial_count = Comment.objects.count()
     client.post(reverse(NEWS_DELETE, kwargs={"pk": comment_fixture.pk}))
     assert Comment.objects.count() == initial_count
+
+
+@pytest.mark.django_db
+def test_comment_count_follows_comments(client, user_fixture, news_fixture):
+    client.login(username=user_fixture.username, password="12345")
+    client.post(
+        reverse(NEWS_DETAIL, kwargs={"pk": news_fixture.pk}),
+        data={"text": "Test Comment"},
+    )
+    news_fixture.refresh_from_db()
+    assert news_fixture.comment_count == 1
+
+    comment = Comment.objects.get()
+    client.post(reverse(NEWS_DELETE, kwargs={"pk": comment.pk}))
+    news_fixture.refresh_from_db()
+    assert news_fixture.comment_count == 0
+
+
+@pytest.mark.django_db
+def test_deleting_flagged_comment_keeps_count(
+    client, user_fixture, news_fixture
+):
+    Comment.objects.create(
+        news=news_fixture, author=user_fixture, text="Visible"
+    )
+    flagged = Comment.objects.create(
+        news=news_fixture, author=user_fixture, text="Hidden", flagged=True
+    )
+    News.objects.recount_comments()
+    client.force_login(user_fixture)
+    client.post(reverse(NEWS_DELETE, kwargs={"pk": flagged.pk}))
+    assert not Comment.objects.filter(pk=flagged.pk).exists()
+    news_fixture.refresh_from_db()
+    assert news_fixture.comment_count == 1
+
+
+@pytest.mark.django_db
+def test_recount_comments_repairs_drift(news_fixture, comment_fixture):
+    News.objects.update(comment_count=42)
+    call_command("recount_comments", stdout=StringIO())
+    news_fixture.refresh_from_db()
+    assert news_fixture.comment_count == 1
+
+
+@pytest.mark.django_db
+def test_recount_comments_resets_cached_fragments(
+    client, django_capture_on_commit_callbacks, news_fixture, comment_fixture
+):
+    home = reverse("news:home")
+    News.objects.update(comment_count=42)
+    assert "Комментариев: 42" in client.get(home).content.decode()
+    with django_capture_on_commit_callbacks(execute=True):
+        call_command("recount_comments", stdout=StringIO())
+    assert "Комментариев: 1" in client.get(home).content.decode()
+
+
+@pytest.mark.parametrize(
+    "text",
+    (
+        "Вот РЕДИСКА!",
+        # Латинские p, e, c, a вместо кириллических.
+        "Вот peдиcкa!",
+        "Ты нeгoдяй",
+    ),
+)
+def test_bad_words_with_lookalikes_detected(text):
+    assert get_bad_words_matcher().search(text)
+
+
+def test_bad_words_loaded_from_file(settings, tmp_path):
+    words_file = tmp_path / "bad_words.txt"
+    words_file.write_text("# словарь\nзлодей\n", encoding="utf-8")
+    settings.BAD_WORDS_FILE = words_file
+    get_bad_words_matcher.cache_clear()
+    try:
+        assert get_bad_words_matcher().search("Какой злодейский план")
+        assert get_bad_words_matcher().search("редиска")
+        assert get_bad_words_matcher().search("Добрый день") is None
+    finally:
+        get_bad_words_matcher.cache_clear()
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("delete", (False, True))
+def test_remoderate_comments(news_fixture, user_fixture, delete):
+    good = Comment.objects.create(
+        news=news_fixture, author=user_fixture, text="Хорошая новость"
+    )
+    bad = Comment.objects.create(
+        news=news_fixture, author=user_fixture, text="Автор — нeгoдяй"
+    )
+    News.objects.recount_comments()
+    options = ["--workers", "1", "--batch-size", "1"]
+    if delete:
+        options.append("--delete")
+    out = StringIO()
+    call_command("remoderate_comments", *options, stdout=out)
+
+    assert "нарушителей: 1" in out.getvalue()
+    assert Comment.objects.filter(pk=good.pk, flagged=False).exists()
+    if delete:
+        assert not Comment.objects.filter(pk=bad.pk).exists()
+    else:
+        assert Comment.objects.get(pk=bad.pk).flagged
+    news_fixture.refresh_from_db()
+    assert news_fixture.comment_count == 1
+
+
+@pytest.mark.django_db
+def test_remoderate_recounts_news_in_batches(monkeypatch, user_fixture):
+    monkeypatch.setattr(
+        "news.management.commands.remoderate_comments.RECOUNT_BATCH_SIZE", 2
+    )
+    news_list = [
+        News.objects.create(title=f"News {i}", text="Content")
+        for i in range(5)
+    ]
+    for news in news_list:
+        Comment.objects.create(
+            news=news, author=user_fixture, text="Автор — нeгoдяй"
+        )
+    News.objects.recount_comments()
+    call_command("remoderate_comments", "--workers", "1", stdout=StringIO())
+    assert set(News.objects.values_list("comment_count", flat=True)) == {0}
+
+
+@pytest.mark.django_db
+def test_import_news_from_jsonl(tmp_path, user_fixture):
+    items = [
+        {
+            "title": f"Imported {i}",
+            "text": "Imported content",
+            "date": "2022-11-0{}".format(i + 1),
+            "comments": [
+                {
+                    "author": user_fixture.username,
+                    "text": f"Comment {i}",
+                    "created": "2022-11-01T12:00:00+00:00",
+                },
+                {"author": "unknown", "text": "Lost comment"},
+            ],
+        }
+        for i in range(3)
+    ]
+    path = tmp_path / "news.jsonl"
+    path.write_text(
+        "\n".join(json.dumps(item, ensure_ascii=False) for item in items),
+        encoding="utf-8",
+    )
+    out = StringIO()
+    call_command("import_news", str(path), "--batch-size", "2", stdout=out)
+
+    assert "пропущено комментариев без автора: 3" in out.getvalue()
+    assert News.objects.count() == 3
+    for news in News.objects.all():
+        comment = news.comment_set.get()
+        assert news.comment_count == 1
+        assert comment.author == user_fixture
+        assert comment.created.year == 2022
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize(
+    "item",
+    (
+        {"text": "No title"},
+        {"title": "No text"},
+        {"title": "Title", "text": "Text", "date": "2022-13-01"},
+        {"title": "Title", "text": "Text", "date": "yesterday"},
+        {"title": "Title", "text": "Text", "comments": [{"text": "Anon"}]},
+    ),
+)
+def test_import_news_rejects_invalid_lines(tmp_path, item):
+    path = tmp_path / "news.jsonl"
+    path.write_text(
+        json.dumps({"title": "Valid", "text": "Valid"}) + "\n"
+        + json.dumps(item),
+        encoding="utf-8",
+    )
+    with pytest.raises(CommandError, match="Строка 2"):
+        call_command("import_news", str(path), stdout=StringIO())
+    assert not News.objects.exists()
+
+
+@pytest.mark.django_db
+def test_import_news_locks_before_reading_last_id(tmp_path):
+    path = tmp_path / "news.jsonl"
+    path.write_text(json.dumps({"title": "Title", "text": "Text"}))
+    with CaptureQueriesContext(connection) as queries:
+        call_command("import_news", str(path), stdout=StringIO())
+    sql = [query["sql"] for query in queries]
+    lock = next(i for i, query in enumerate(sql) if query.startswith("UPDATE"))
+    last_id = next(i for i, query in enumerate(sql) if "MAX(" in query)
+    assert lock < last_id
+
+
+@pytest.mark.django_db
+def test_comment_flow_query_counts(
+    client, django_assert_num_queries, user_fixture, comment_fixture
+):
+    """
+    Сессия и пользователь — два запроса, дальше объект грузится один раз.
+
+    SAVEPOINT и RELEASE SAVEPOINT считаются отдельными запросами.
+    """
+    client.force_login(user_fixture)
+    detail_url = reverse(NEWS_DETAIL, kwargs={"pk": comment_fixture.news_id})
+    edit_url = reverse(NEWS_EDIT, kwargs={"pk": comment_fixture.pk})
+    delete_url = reverse(NEWS_DELETE, kwargs={"pk": comment_fixture.pk})
+    with django_assert_num_queries(7):
+        client.post(detail_url, data={"text": "Test Comment"})
+    with django_assert_num_queries(3):
+        client.get(edit_url)
+    with django_assert_num_queries(4):
+        client.post(edit_url, data={"text": "Updated Comment"})
+    with django_assert_num_queries(3):
+        client.get(delete_url)
+    with django_assert_num_queries(7):
+        client.post(delete_url)
@@ -1,8 +1,25 @@
+import json
+import pstats
+import subprocess
+import sys
+import threading
+
 import pytest
 
+from django.conf import settings
 from django.contrib.auth.models import User
+from django.test import Client
 from django.urls import reverse
 
+from monitoring.metrics import (
+    COUNT,
+    FILE_SUFFIX,
+    HistogramFile,
+    collect,
+    observe,
+)
+from monitoring.profiling import make_token
+from monitoring.slow_queries import fingerprint, slow_query_log
 from news.models import News, Comment
 
 
@@ -81,3 +98,227 @@ def test_detail_route_availability(client, news_fixture):
     news = news_fixture
     response = client.get(reverse(NEWS_DETAIL, kwargs={"pk": news.pk}))
     assert response.status_code == 200
+
+
+@pytest.mark.django_db
+def test_archive_routes_availability(client, news_fixture):
+    date = news_fixture.date
+    response = client.get(
+        reverse("news:archive_month", args=(date.year, date.month))
+    )
+    assert response.status_code == 200
+    assert news_fixture in response.context["object_list"]
+    response = client.get(
+        reverse("news:archive_day", args=(date.year, date.month, date.day))
+    )
+    assert response.status_code == 200
+    assert news_fixture in response.context["object_list"]
+
+
+@pytest.mark.django_db
+def test_invalid_cursor_returns_not_found(client, news_fixture):
+    response = client.get(reverse(NEWS_HOME), {"before": "yesterday"})
+    assert response.status_code == 404
+
+
+@pytest.mark.django_db
+def test_detail_conditional_get(
+    client, django_assert_num_queries, news_fixture, user_fixture
+):
+    url = reverse(NEWS_DETAIL, kwargs={"pk": news_fixture.pk})
+    etag = client.get(url)["ETag"]
+    with django_assert_num_queries(1):
+        response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 304
+
+    Comment.objects.create(
+        news=news_fixture, author=user_fixture, text="New Comment"
+    )
+    response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 200
+    assert response["ETag"] != etag
+
+
+@pytest.mark.django_db
+def test_detail_etag_changes_after_relogin(news_fixture, user_fixture):
+    """После нового входа страница с прежним CSRF-токеном не отдаётся 304."""
+    client = Client(enforce_csrf_checks=True)
+    login_url = reverse("users:login")
+    credentials = {"username": user_fixture.username, "password": "12345"}
+
+    def log_in():
+        client.get(login_url)
+        token = client.cookies[settings.CSRF_COOKIE_NAME].value
+        response = client.post(
+            login_url, {**credentials, "csrfmiddlewaretoken": token}
+        )
+        assert response.status_code == 302
+
+    url = reverse(NEWS_DETAIL, kwargs={"pk": news_fixture.pk})
+    log_in()
+    etag = client.get(url)["ETag"]
+    client.get(reverse("users:logout"))
+    log_in()
+
+    response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 200
+    response = client.post(
+        url,
+        {
+            "text": "New Comment",
+            "csrfmiddlewaretoken": response.context["csrf_token"],
+        },
+    )
+    assert response.status_code == 302
+
+
+@pytest.mark.django_db
+def test_server_timing_header(client, news_fixture, caplog):
+    with caplog.at_level("INFO", logger="monitoring.requests"):
+        response = client.get(
+            reverse(NEWS_DETAIL, kwargs={"pk": news_fixture.pk})
+        )
+    metrics = dict(
+        part.strip().split(";", 1)
+        for part in response["Server-Timing"].split(",")
+    )
+    assert set(metrics) == {"db", "view", "tpl", "total"}
+    record = json.loads(caplog.records[-1].getMessage())
+    assert record["url_name"] == NEWS_DETAIL
+    assert record["status"] == 200
+    assert record["queries"] > 0
+    assert f'desc="{record["queries"]} queries"' in metrics["db"]
+    assert record["total_ms"] >= record["template_ms"] > 0
+
+
+def test_metrics_file_reopened_keeps_slots(metrics_dir):
+    metrics_dir.mkdir()
+    path = metrics_dir / f"1-1{FILE_SUFFIX}"
+    histograms = HistogramFile(path)
+    for _ in range(5):
+        histograms.observe(NEWS_HOME, 0.01, 1)
+    histograms.observe(NEWS_DETAIL, 0.01, 1)
+
+    HistogramFile(path).observe(NEWS_DETAIL, 0.01, 1)
+    totals = collect(metrics_dir)
+    assert totals[NEWS_HOME][COUNT] == 5
+    assert totals[NEWS_DETAIL][COUNT] == 2
+
+
+def test_metrics_threads_reuse_files(metrics_dir):
+    for _ in range(3):
+        thread = threading.Thread(target=observe, args=(NEWS_HOME, 0.01, 1))
+        thread.start()
+        thread.join()
+        del thread
+    assert len(list(metrics_dir.iterdir())) == 1
+    assert collect(metrics_dir)[NEWS_HOME][COUNT] == 3
+
+
+def test_metrics_drop_dead_processes(metrics_dir):
+    process = subprocess.Popen((sys.executable, "-c", ""))
+    process.wait()
+    dead = metrics_dir / f"{process.pid}-0{FILE_SUFFIX}"
+    metrics_dir.mkdir()
+    HistogramFile(dead).observe(NEWS_HOME, 2.0, 40)
+    observe(NEWS_HOME, 0.01, 1)
+
+    assert collect(metrics_dir)[NEWS_HOME][COUNT] == 1
+    assert not dead.exists()
+
+
+@pytest.mark.django_db
+def test_metrics_merge_processes(client, news_fixture, metrics_dir):
+    for _ in range(3):
+        client.get(reverse(NEWS_HOME))
+    # Файл другого процесса с одним медленным запросом.
+    HistogramFile(metrics_dir / f"1-1{FILE_SUFFIX}").observe(
+        NEWS_HOME, 2.0, 40
+    )
+
+    response = client.get(reverse("monitoring:metrics"))
+    assert response.status_code == 200
+    lines = response.content.decode().splitlines()
+    labels = f'view="{NEWS_HOME}"'
+    assert f"http_request_duration_seconds_count{{{labels}}} 4" in lines
+    assert f'http_request_queries_bucket{{{labels},le="64"}} 4' in lines
+    assert f'http_request_queries_bucket{{{labels},le="32"}} 3' in lines
+    p99 = next(
+        line
+        for line in lines
+        if line.startswith("http_request_duration_quantile_seconds")
+        and labels in line
+        and 'quantile="0.99"' in line
+    )
+    assert 1.8 < float(p99.split()[-1]) < 2.2
+
+    response = client.get(
+        reverse("monitoring:metrics"), REMOTE_ADDR="10.0.0.1"
+    )
+    assert response.status_code == 404
+
+
+def test_slow_query_fingerprint_ignores_values():
+    assert fingerprint(
+        "SELECT * FROM news_news WHERE id IN (%s, %s) AND title = 'a'"
+    ) == fingerprint(
+        "SELECT * FROM news_news WHERE id IN (%s, %s, %s) AND title = 'b'"
+    )
+    assert fingerprint("SELECT 1 FROM news_news") != fingerprint(
+        "SELECT 1 FROM news_comment"
+    )
+
+
+@pytest.mark.django_db
+def test_slow_queries_logged_with_plan(
+    client, settings, comment_fixture, caplog
+):
+    settings.MONITORING_SLOW_QUERY_MS = 0
+    slow_query_log.clear()
+    url = reverse(NEWS_DETAIL, kwargs={"pk": comment_fixture.news_id})
+    with caplog.at_level("WARNING", logger="monitoring.slow_queries"):
+        client.get(url)
+        client.get(url)
+    records = [
+        json.loads(record.getMessage())
+        for record in caplog.records
+        if record.name == "monitoring.slow_queries"
+    ]
+    first = [record for record in records if record["count"] == 1]
+    assert len({record["fingerprint"] for record in first}) == len(first)
+    assert {record["count"] for record in records} == {1, 2}
+    assert all(record["url_name"] == NEWS_DETAIL for record in records)
+    comments = next(
+        record
+        for record in first
+        if 'FROM "news_comment"' in record["sql"]
+        and "ORDER BY" in record["sql"]
+    )
+    assert any(
+        "comment_news_created_idx" in line for line in comments["plan"]
+    )
+    assert "plan" not in next(r for r in records if r["count"] == 2)
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize(
+    "mode, suffix", (("cprofile", ".prof"), ("sample", ".collapsed"))
+)
+def test_profiled_request_writes_file(
+    client, settings, tmp_path, news_fixture, mode, suffix
+):
+    profiles = settings.MONITORING_PROFILE_DIR = tmp_path / "profiles"
+    url = reverse(NEWS_DETAIL, kwargs={"pk": news_fixture.pk})
+
+    response = client.get(url, HTTP_X_PROFILE=make_token(mode))
+    assert response.status_code == 200
+    (profile,) = profiles.iterdir()
+    assert profile.name == response["X-Profile-File"]
+    assert profile.name.startswith("news.detail-")
+    assert profile.suffix == suffix
+    if mode == "cprofile":
+        assert pstats.Stats(str(profile)).total_calls > 0
+
+    client.get(url, {"_profile": make_token(mode) + "x"})
+    client.get(url)
+    assert len(list(profiles.iterdir())) == 1
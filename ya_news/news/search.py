@@ -0,0 +1,60 @@
+import re
+
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+from .models import News
+
+# Границы совпадений, которые не встречаются в тексте новостей.
+MARK_START = "\x02"
+MARK_END = "\x03"
+
+SEARCH_SQL = f"""
+    SELECT
+        news_news.*,
+        highlight(news_search, 0, '{MARK_START}', '{MARK_END}')
+            AS title_highlight,
+        snippet(news_search, 1, '{MARK_START}', '{MARK_END}', '…', 16)
+            AS text_snippet
+    FROM news_search
+    JOIN news_news ON news_news.id = news_search.rowid
+    WHERE news_search MATCH %s
+    ORDER BY bm25(news_search, 10.0, 1.0)
+    LIMIT %s
+"""
+
+
+def build_match(query):
+    """
+    Превращает запрос пользователя в выражение MATCH.
+
+    Каждое слово ищется как префикс, операторы FTS5 из запроса
+    не интерпретируются.
+    """
+    words = re.findall(r"\w+", query)
+    return " ".join(f'"{word}"*' for word in words)
+
+
+def highlight(text):
+    """Экранирует текст и выделяет найденные слова тегом mark."""
+    return mark_safe(
+        escape(text)
+        .replace(MARK_START, "<mark>")
+        .replace(MARK_END, "</mark>")
+    )
+
+
+def search_news(query, limit):
+    """
+    Ищет новости по индексу news_search, лучшие совпадения первыми.
+
+    Совпадения в заголовке весят больше, чем в тексте.
+    """
+    match = build_match(query)
+    if not match:
+        return []
+    results = list(News.objects.raw(SEARCH_SQL, [match, limit]))
+    for news in results:
+        news.title_highlight = highlight(news.title_highlight)
+        news.text_snippet = highlight(news.text_snippet)
+    return results
@@ -6,7 +6,23 @@ app_name = "news"
 
 urlpatterns = [
     path("", views.NewsList.as_view(), name="home"),
+    path(
+        "archive/<int:year>/<int:month>/",
+        views.NewsMonthArchive.as_view(),
+        name="archive_month",
+    ),
+    path(
+        "archive/<int:year>/<int:month>/<int:day>/",
+        views.NewsDayArchive.as_view(),
+        name="archive_day",
+    ),
+    path("search/", views.NewsSearch.as_view(), name="search"),
     path("news/<int:pk>/", views.NewsDetailView.as_view(), name="detail"),
+    path(
+        "news/<int:pk>/comments/",
+        views.NewsComments.as_view(),
+        name="comments",
+    ),
     path(
         "delete_comment/<int:pk>/",
         views.CommentDelete.as_view(),
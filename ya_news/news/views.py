@@ -1,40 +1,200 @@
+import datetime
+import hashlib
+
 from django.conf import settings
 from django.contrib.auth.mixins import LoginRequiredMixin
-from django.shortcuts import get_object_or_404
+from django.db import transaction
+from django.db.models import F, OuterRef, Q, Subquery
+from django.http import Http404, JsonResponse
+from django.template.loader import render_to_string
 from django.urls import reverse
+from django.utils.decorators import method_decorator
 from django.views import generic
+from django.views.decorators.http import condition
 
 from .forms import CommentForm
-from .models import Comment, News
+from .models import Comment, News, get_news_versions
+from .search import search_news
+
+
+class RequestObjectCacheMixin:
+    """
+    Объект из get_object() загружается один раз за запрос.
+
+    Кэш хранится в самом запросе, поэтому им пользуются и разные
+    представления, между которыми запрос делит NewsDetailView.
+    """
+
+    def get_object(self, queryset=None):
+        if queryset is not None:
+            return super().get_object(queryset)
+        cache = self.request.__dict__.setdefault("_object_cache", {})
+        key = (self.model, self.kwargs.get(self.pk_url_kwarg))
+        if key not in cache:
+            cache[key] = super().get_object()
+        return cache[key]
+
 
+class NewsFeedMixin:
+    """
+    Лента новостей с переходом к более ранним новостям.
 
-class NewsList(generic.ListView):
-    """Список новостей."""
+    Вместо OFFSET используется курсор (дата, id) последней показанной
+    новости, поэтому любая страница обходится так же дёшево, как первая.
+    """
 
     model = News
+    ordering = ("-date", "-id")
+    cursor_param = "before"
+
+    def get_cursor(self):
+        """Разбирает курсор вида ``<дата>_<id>`` из параметров запроса."""
+        cursor = self.request.GET.get(self.cursor_param)
+        if not cursor:
+            return None
+        try:
+            date, pk = cursor.split("_")
+            return datetime.date.fromisoformat(date), int(pk)
+        except ValueError:
+            raise Http404("Некорректный курсор.")
+
+    def get_context_data(self, **kwargs):
+        queryset = kwargs.pop("object_list", self.object_list)
+        cursor = self.get_cursor()
+        if cursor is not None:
+            date, pk = cursor
+            # Условие на date__lte позволяет SQLite искать по диапазону
+            # индекса, а не просматривать его с самого начала.
+            queryset = queryset.filter(
+                Q(date__lte=date), Q(date__lt=date) | Q(id__lt=pk)
+            )
+        page_size = settings.NEWS_COUNT_ON_HOME_PAGE
+        object_list = list(queryset[: page_size + 1])
+        next_cursor = None
+        if len(object_list) > page_size:
+            object_list = object_list[:page_size]
+            last = object_list[-1]
+            next_cursor = f"{last.date.isoformat()}_{last.pk}"
+        versions = get_news_versions(news.pk for news in object_list)
+        for news in object_list:
+            news.cache_version = versions[news.pk]
+        return super().get_context_data(
+            object_list=object_list,
+            next_cursor=next_cursor,
+            cursor_param=self.cursor_param,
+            **kwargs,
+        )
+
+
+class NewsList(NewsFeedMixin, generic.ListView):
+    """
+    Список новостей.
+
+    На странице выводится несколько новостей, их количество
+    определяется в настройках проекта.
+    """
+
     template_name = "news/home.html"
 
-    def get_queryset(self):
-        """
-        Выводим только несколько последних новостей.
 
-        Их количество определяется в настройках проекта.
-        """
-        return self.model.objects.prefetch_related("comment_set")[
-            : settings.NEWS_COUNT_ON_HOME_PAGE
-        ]
+class NewsArchiveMixin(NewsFeedMixin):
+    """
+    Лента новостей за месяц или день.
 
+    При allow_empty = False DateListView проверяет пустоту выборки через
+    ``not qs`` и загружает весь период целиком, поэтому пустой период
+    отсекается отдельным запросом exists().
+    """
 
-class NewsDetail(generic.DetailView):
-    model = News
-    template_name = "news/detail.html"
+    date_field = "date"
+    month_format = "%m"
+    allow_empty = True
+    template_name = "news/archive.html"
 
-    def get_object(self, queryset=None):
-        obj = get_object_or_404(
-            self.model.objects.prefetch_related("comment_set__author"),
-            pk=self.kwargs["pk"],
+    def get_dated_queryset(self, **lookup):
+        queryset = super().get_dated_queryset(**lookup)
+        if not queryset.exists():
+            raise Http404("Новостей за этот период нет.")
+        return queryset
+
+
+class NewsMonthArchive(NewsArchiveMixin, generic.MonthArchiveView):
+    """Новости за месяц."""
+
+
+class NewsDayArchive(NewsArchiveMixin, generic.DayArchiveView):
+    """Новости за день."""
+
+
+class CommentPageMixin:
+    """
+    Постраничный вывод комментариев к новости.
+
+    Комментарии выбираются по курсору (created, id) последнего
+    показанного комментария, так что страница любой глубины
+    читается из индекса (news, created) за один запрос.
+    """
+
+    cursor_param = "after"
+
+    def get_comment_cursor(self):
+        """Разбирает курсор вида ``<created>_<id>`` из параметров запроса."""
+        cursor = self.request.GET.get(self.cursor_param)
+        if not cursor:
+            return None
+        try:
+            created, pk = cursor.rsplit("_", 1)
+            return datetime.datetime.fromisoformat(created), int(pk)
+        except ValueError:
+            raise Http404("Некорректный курсор.")
+
+    def get_comments_page(self):
+        """Возвращает страницу комментариев и курсор следующей страницы."""
+        queryset = Comment.objects.filter(
+            news=self.object, flagged=False
+        ).select_related("author")
+        cursor = self.get_comment_cursor()
+        if cursor is not None:
+            created, pk = cursor
+            queryset = queryset.filter(
+                Q(created__gte=created), Q(created__gt=created) | Q(id__gt=pk)
+            )
+        page_size = settings.COMMENTS_COUNT_ON_DETAIL_PAGE
+        comments = list(queryset[: page_size + 1])
+        next_cursor = None
+        if len(comments) > page_size:
+            comments = comments[:page_size]
+            last = comments[-1]
+            next_cursor = f"{last.created.isoformat()}_{last.pk}"
+        return comments, next_cursor
+
+    def get_context_data(self, **kwargs):
+        comments, next_cursor = self.get_comments_page()
+        return super().get_context_data(
+            comments=comments,
+            next_comments_cursor=next_cursor,
+            comments_cursor_param=self.cursor_param,
+            **kwargs,
+        )
+
+
+class NewsSearch(generic.TemplateView):
+    """Полнотекстовый поиск по новостям."""
+
+    template_name = "news/search.html"
+
+    def get_context_data(self, **kwargs):
+        query = self.request.GET.get("q", "").strip()
+        return super().get_context_data(
+            query=query,
+            results=search_news(query, settings.NEWS_COUNT_ON_HOME_PAGE),
+            **kwargs,
         )
-        return obj
+
+
+class NewsDetail(CommentPageMixin, generic.DetailView):
+    model = News
+    template_name = "news/detail.html"
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -44,7 +204,11 @@ class NewsDetail(generic.DetailView):
 
 
 class NewsComment(
-    LoginRequiredMixin, generic.detail.SingleObjectMixin, generic.FormView
+    LoginRequiredMixin,
+    RequestObjectCacheMixin,
+    CommentPageMixin,
+    generic.detail.SingleObjectMixin,
+    generic.FormView,
 ):
     model = News
     form_class = CommentForm
@@ -58,15 +222,89 @@ class NewsComment(
         comment = form.save(commit=False)
         comment.news = self.object
         comment.author = self.request.user
-        comment.save()
+        with transaction.atomic():
+            comment.save()
+            News.objects.filter(pk=self.object.pk).update(
+                comment_count=F("comment_count") + 1
+            )
         return super().form_valid(form)
 
     def get_success_url(self):
-        post = self.get_object()
-        return reverse("news:detail", kwargs={"pk": post.pk}) + "#comments"
+        return (
+            reverse("news:detail", kwargs={"pk": self.object.pk})
+            + "#comments"
+        )
+
+
+class NewsComments(CommentPageMixin, generic.detail.BaseDetailView):
+    """Следующая страница комментариев к новости в формате JSON."""
+
+    model = News
+
+    def render_to_response(self, context):
+        return JsonResponse(
+            {
+                "comments": [
+                    {
+                        "id": comment.pk,
+                        "author": comment.author.get_username(),
+                        "text": comment.text,
+                        "created": comment.created.isoformat(),
+                        "html": render_to_string(
+                            "includes/comment.html",
+                            {"comment": comment},
+                            request=self.request,
+                        ),
+                    }
+                    for comment in context["comments"]
+                ],
+                "next_cursor": context["next_comments_cursor"],
+            }
+        )
+
+
+def news_detail_etag(request, pk):
+    """
+    Валидатор страницы новости для условных GET-запросов.
+
+    Считается одним запросом: счётчик хранится в новости, а время
+    последнего комментария берётся одним шагом по индексу
+    (news, created), так что цена не зависит от числа комментариев.
+    Версия из кэша учитывает правку новости и комментариев,
+    а пользователь, CSRF-токен формы и курсор — то, что страница
+    у каждого своя: после нового входа токен меняется, и страница
+    с прежним токеном не должна отдаваться из кэша браузера.
+    """
+    last_created = (
+        Comment.objects.filter(news_id=OuterRef("pk"))
+        .order_by("-created")
+        .values("created")[:1]
+    )
+    state = (
+        News.objects.filter(pk=pk)
+        .annotate(last=Subquery(last_created))
+        .values_list("comment_count", "last")
+        .first()
+    )
+    if state is None:
+        return None
+    version = get_news_versions([pk])[pk]
+    validator = "|".join(
+        str(part)
+        for part in (
+            pk,
+            *state,
+            version,
+            request.user.pk,
+            request.META.get("CSRF_COOKIE"),
+            request.GET.urlencode(),
+        )
+    )
+    return hashlib.sha1(validator.encode()).hexdigest()
 
 
 class NewsDetailView(generic.View):
+    @method_decorator(condition(etag_func=news_detail_etag))
     def get(self, request, *args, **kwargs):
         view = NewsDetail.as_view()
         return view(request, *args, **kwargs)
@@ -76,7 +314,7 @@ class NewsDetailView(generic.View):
         return view(request, *args, **kwargs)
 
 
-class CommentBase(LoginRequiredMixin):
+class CommentBase(LoginRequiredMixin, RequestObjectCacheMixin):
     """Базовый класс для работы с комментариями."""
 
     model = Comment
@@ -84,13 +322,15 @@ class CommentBase(LoginRequiredMixin):
     def get_success_url(self):
         comment = self.get_object()
         return (
-            reverse("news:detail", kwargs={"pk": comment.news.pk})
+            reverse("news:detail", kwargs={"pk": comment.news_id})
             + "#comments"
         )
 
     def get_queryset(self):
         """Пользователь может работать только со своими комментариями."""
-        return self.model.objects.filter(author=self.request.user)
+        return self.model.objects.filter(
+            author=self.request.user
+        ).select_related("news")
 
 
 class CommentUpdate(CommentBase, generic.UpdateView):
@@ -104,3 +344,13 @@ class CommentDelete(CommentBase, generic.DeleteView):
     """Удаление комментария."""
 
     template_name = "news/delete.html"
+
+    def delete(self, request, *args, **kwargs):
+        with transaction.atomic():
+            response = super().delete(request, *args, **kwargs)
+            # Скрытые модерацией комментарии в счётчике не учтены.
+            if not self.object.flagged:
+                News.objects.filter(
+                    pk=self.object.news_id, comment_count__gt=0
+                ).update(comment_count=F("comment_count") - 1)
+        return response
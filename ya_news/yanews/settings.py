@@ -1,9 +1,16 @@
+import sys
+import tempfile
 from pathlib import Path
 
 from django.urls import reverse_lazy
 
 BASE_DIR = Path(__file__).resolve().parent.parent
 
+# Общий для обоих проектов пакет monitoring лежит в корне репозитория.
+REPO_DIR = BASE_DIR.parent
+if str(REPO_DIR) not in sys.path:
+    sys.path.append(str(REPO_DIR))
+
 SECRET_KEY = (
     "django-insecure-7)dgs++2!#==aye4rd=5)c)bw0eokiyqx0hts6#t80!$c&$s+("
 )
@@ -19,10 +26,14 @@ INSTALLED_APPS = [
     "django.contrib.sessions",
     "django.contrib.messages",
     "django.contrib.staticfiles",
+    "monitoring",
     "news.apps.NewsConfig",
 ]
 
 MIDDLEWARE = [
+    "monitoring.middleware.TimingMiddleware",
+    "monitoring.slow_queries.SlowQueryMiddleware",
+    "monitoring.profiling.ProfilingMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -61,6 +72,18 @@ DATABASES = {
 }
 
 
+# Версии фрагментов сбрасываются из любого процесса, в том числе из
+# команд manage.py, поэтому кэш должен быть общим: LocMemCache у каждого
+# процесса свой, и сброс версии в нём не виден процессам сервера.
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+        "LOCATION": Path(tempfile.gettempdir()) / "yanews-cache",
+        "OPTIONS": {"MAX_ENTRIES": 10000},
+    }
+}
+
+
 AUTH_PASSWORD_VALIDATORS = []
 
 
@@ -82,3 +105,33 @@ LOGIN_URL = reverse_lazy("users:login")
 LOGIN_REDIRECT_URL = reverse_lazy("news:home")
 
 NEWS_COUNT_ON_HOME_PAGE = 10
+
+COMMENTS_COUNT_ON_DETAIL_PAGE = 50
+
+# Файл с дополнительными запрещёнными словами, по одному на строку.
+BAD_WORDS_FILE = None
+
+INTERNAL_IPS = ["127.0.0.1"]
+
+# Файлы гистограмм всех процессов; None отключает сбор метрик.
+MONITORING_METRICS_DIR = Path(tempfile.gettempdir()) / "yanews-metrics"
+
+# Запросы к базе дольше этого числа миллисекунд попадают в журнал
+# monitoring.slow_queries; None отключает журнал.
+MONITORING_SLOW_QUERY_MS = 100
+
+# Профили запросов с токеном из manage.py profile_token; None отключает.
+MONITORING_PROFILE_DIR = Path(tempfile.gettempdir()) / "yanews-profiles"
+# Срок действия токена профилирования в секундах.
+MONITORING_PROFILE_MAX_AGE = 60 * 60
+
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "handlers": {
+        "console": {"class": "logging.StreamHandler"},
+    },
+    "loggers": {
+        "monitoring": {"handlers": ["console"], "level": "INFO"},
+    },
+}
@@ -7,6 +7,7 @@ from django.views.generic import CreateView
 urlpatterns = [
     path("", include("news.urls")),
     path("admin/", admin.site.urls),
+    path("monitoring/", include("monitoring.urls")),
 ]
 
 auth_urls = (
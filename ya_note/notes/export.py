@@ -0,0 +1,53 @@
+import json
+import zipfile
+
+EXPORT_CHUNK_SIZE = 100
+
+
+class _StreamBuffer:
+    """Файл без seek: zipfile пишет в него, а генератор забирает байты."""
+
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def pop(self):
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def export_jsonl(notes):
+    """Отдаёт заметки по одной строке JSON на заметку."""
+    for note in notes.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        yield json.dumps(
+            {
+                "title": note.title,
+                "text": note.text,
+                "slug": note.slug,
+            },
+            ensure_ascii=False,
+        ) + "\n"
+
+
+def export_zip(notes):
+    """
+    Отдаёт ZIP-архив с заметками в Markdown по мере его создания.
+
+    В памяти копятся только записи оглавления архива, сами заметки
+    сжимаются и отдаются по одной.
+    """
+    buffer = _StreamBuffer()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archive:
+        for note in notes.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+            archive.writestr(
+                f"{note.slug}.md", f"# {note.title}\n\n{note.text}\n"
+            )
+            yield buffer.pop()
+    yield buffer.pop()
@@ -0,0 +1,143 @@
+import zlib
+from functools import lru_cache
+
+from django.db import models
+from django.db.models.query_utils import DeferredAttribute
+
+
+def compress_text(text, threshold):
+    """
+    Сжимает текст длиннее threshold байт.
+
+    Возвращает bytes, если сжатие уменьшило размер, иначе исходную строку.
+    """
+    data = text.encode()
+    if len(data) <= threshold:
+        return text
+    compressed = zlib.compress(data)
+    return compressed if len(compressed) < len(data) else text
+
+
+def decompress_text(data):
+    return zlib.decompress(data).decode()
+
+
+class CompressedText:
+    """Сжатое значение из базы; распаковывается при первом обращении."""
+
+    __slots__ = ("data",)
+
+    def __init__(self, data):
+        self.data = data
+
+
+def _unwrap(value):
+    if isinstance(value, CompressedText):
+        return decompress_text(value.data)
+    return value
+
+
+@lru_cache(maxsize=None)
+def _decompressing(iterable_class):
+    """Итератор values()/values_list(), отдающий сжатый текст строкой."""
+
+    class DecompressingIterable(iterable_class):
+        def __iter__(self):
+            for row in super().__iter__():
+                if isinstance(row, dict):
+                    yield {key: _unwrap(value) for key, value in row.items()}
+                elif hasattr(row, "_make"):
+                    yield row._make(map(_unwrap, row))
+                elif isinstance(row, tuple):
+                    yield tuple(map(_unwrap, row))
+                else:
+                    yield _unwrap(row)
+
+    return DecompressingIterable
+
+
+class CompressedTextQuerySet(models.QuerySet):
+    """
+    QuerySet модели со сжатыми полями.
+
+    Экземпляры модели распаковывают текст при обращении к атрибуту,
+    а values() и values_list() отдают его сразу строкой.
+    """
+
+    def values(self, *fields, **expressions):
+        clone = super().values(*fields, **expressions)
+        clone._iterable_class = _decompressing(clone._iterable_class)
+        return clone
+
+    def values_list(self, *fields, flat=False, named=False):
+        clone = super().values_list(*fields, flat=flat, named=named)
+        clone._iterable_class = _decompressing(clone._iterable_class)
+        return clone
+
+
+class CompressedTextDescriptor(DeferredAttribute):
+    """
+    Атрибут модели, распаковывающий значение при чтении.
+
+    Дескриптор с __set__, поэтому чтение идёт через него даже тогда,
+    когда значение уже лежит в __dict__ экземпляра.
+    """
+
+    def __set__(self, instance, value):
+        instance.__dict__[self.field.attname] = value
+
+    def __get__(self, instance, cls=None):
+        if instance is None:
+            return self
+        value = super().__get__(instance, cls)
+        if isinstance(value, CompressedText):
+            value = decompress_text(value.data)
+            instance.__dict__[self.field.attname] = value
+        return value
+
+
+class CompressedTextField(models.TextField):
+    """
+    Текстовое поле, которое хранит длинные значения сжатыми zlib.
+
+    Значения больше threshold байт записываются в ту же колонку как BLOB,
+    короткие остаются обычным текстом. Прочитанное из базы значение
+    распаковывается только при обращении к атрибуту модели; values()
+    и values_list() менеджера на CompressedTextQuerySet сразу отдают
+    строку. Поиск
+    по содержимому таких полей в базе не работает.
+    """
+
+    descriptor_class = CompressedTextDescriptor
+
+    def __init__(self, *args, threshold=4096, **kwargs):
+        self.threshold = threshold
+        super().__init__(*args, **kwargs)
+
+    def deconstruct(self):
+        name, path, args, kwargs = super().deconstruct()
+        if self.threshold != 4096:
+            kwargs["threshold"] = self.threshold
+        return name, path, args, kwargs
+
+    def from_db_value(self, value, expression, connection):
+        if isinstance(value, bytes):
+            return CompressedText(value)
+        return value
+
+    def to_python(self, value):
+        if isinstance(value, CompressedText):
+            return value
+        return super().to_python(value)
+
+    def pre_save(self, model_instance, add):
+        # Нераспакованное значение сохраняется как есть, без повторного сжатия.
+        return model_instance.__dict__.get(self.attname)
+
+    def get_prep_value(self, value):
+        if isinstance(value, CompressedText):
+            return value.data
+        value = super().get_prep_value(value)
+        if value is None:
+            return value
+        return compress_text(value, self.threshold)
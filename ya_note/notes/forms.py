@@ -1,9 +1,9 @@
-from pytils.translit import slugify
-
 from django import forms
+from django.conf import settings
 from django.core.exceptions import ValidationError
+from django.core.validators import validate_slug
 
-from .models import Note
+from .models import Note, SLUG_MAX_LENGTH, slugify_title
 
 WARNING = " - такой slug уже существует, придумайте уникальное значение!"
 
@@ -21,7 +21,7 @@ class NoteForm(forms.ModelForm):
         slug = cleaned_data.get("slug")
         if not slug:
             title = cleaned_data.get("title")
-            slug = slugify(title)[:100]
+            slug = slugify_title(title)
         if (
             Note.objects.filter(slug=slug)
             .exclude(id=self.instance.pk)
@@ -29,3 +29,59 @@ class NoteForm(forms.ModelForm):
         ):
             raise ValidationError(slug + WARNING)
         return slug
+
+
+class SlugListField(forms.Field):
+    """Список slug: из повторяющегося параметра формы или JSON-массива."""
+
+    widget = forms.MultipleHiddenInput
+
+    def to_python(self, value):
+        if not value:
+            return []
+        if not isinstance(value, list) or not all(
+            isinstance(slug, str) for slug in value
+        ):
+            raise ValidationError("Ожидается список slug.")
+        return list(dict.fromkeys(value))
+
+    def validate(self, value):
+        super().validate(value)
+        limit = settings.NOTES_BULK_LIMIT
+        if len(value) > limit:
+            raise ValidationError(f"Не больше {limit} заметок за раз.")
+        for slug in value:
+            if len(slug) > SLUG_MAX_LENGTH:
+                raise ValidationError(f"{slug} - слишком длинный slug.")
+            validate_slug(slug)
+
+
+class NoteBulkForm(forms.Form):
+    """Действие над несколькими заметками сразу."""
+
+    DELETE = "delete"
+    UPDATE = "update"
+
+    action = forms.ChoiceField(
+        choices=((DELETE, "Удалить"), (UPDATE, "Изменить"))
+    )
+    slugs = SlugListField()
+    title = forms.CharField(
+        required=False, max_length=Note._meta.get_field("title").max_length
+    )
+    text = forms.CharField(required=False)
+
+    def clean(self):
+        cleaned_data = super().clean()
+        if cleaned_data.get("action") == self.UPDATE and not self.changes:
+            raise ValidationError("Укажите новый заголовок или текст.")
+        return cleaned_data
+
+    @property
+    def changes(self):
+        """Новые значения полей, которые нужно записать в заметки."""
+        return {
+            field: self.cleaned_data[field]
+            for field in ("title", "text")
+            if self.cleaned_data.get(field)
+        }
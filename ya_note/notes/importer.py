@@ -0,0 +1,133 @@
+from itertools import islice
+
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_slug
+from django.db import connection, transaction
+
+from .models import SLUG_MAX_LENGTH, Note, slugify_title
+
+# Основа slug для заметок, из заголовка которых slug не получается.
+FALLBACK_SLUG = "note"
+
+
+def slug_base(item):
+    """
+    Основа slug импортируемой заметки.
+
+    Указанный slug берётся как есть, если он допустим для адреса,
+    иначе переводится в допустимый. Пустой результат заменяется
+    slug из заголовка, а если пуст и он — FALLBACK_SLUG.
+    """
+    slug = item.get("slug") or ""
+    try:
+        validate_slug(slug)
+    except ValidationError:
+        slug = slugify_title(slug)
+    if len(slug) > SLUG_MAX_LENGTH:
+        slug = slugify_title(slug)
+    return slug or slugify_title(item["title"]) or FALLBACK_SLUG
+
+
+class SlugAllocator:
+    """
+    Выдаёт уникальные slug для порций импортируемых заметок.
+
+    Занятые варианты каждой порции — сам slug и slug с числовым
+    суффиксом — находятся одним запросом под блокировкой записи,
+    дальше суффиксы подбираются в памяти.
+    """
+
+    def __init__(self):
+        self.taken = set()
+        self.loaded = set()
+        self.next_number = {}
+
+    def forget_taken(self):
+        """Забывает занятые slug; номера суффиксов остаются подсказкой."""
+        self.taken.clear()
+        self.loaded.clear()
+
+    def load_taken(self, bases):
+        """
+        Одним запросом запоминает занятые slug вида base и base-N.
+
+        В slug нет символов меньше ".", кроме "-", поэтому диапазон
+        [base, base + ".") содержит ровно base и base-что-угодно
+        и читается из уникального индекса по slug.
+        """
+        new_bases = [base for base in bases if base not in self.loaded]
+        if not new_bases:
+            return
+        self.loaded.update(new_bases)
+        values = ", ".join(["(%s)"] * len(new_bases))
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"WITH bases(base) AS (VALUES {values}) "
+                f"SELECT slug FROM {Note._meta.db_table} "
+                "JOIN bases ON slug >= base AND slug < base || '.'",
+                new_bases,
+            )
+            self.taken.update(slug for slug, in cursor.fetchall())
+
+    def allocate(self, base):
+        """Возвращает base или base-N, которых ещё нет среди заметок."""
+        slug = base
+        number = self.next_number.get(base, 1)
+        while slug in self.taken:
+            suffix = f"-{number}"
+            prefix = base[: SLUG_MAX_LENGTH - len(suffix)]
+            # Укороченный под суффикс slug лежит вне диапазона base,
+            # его занятые варианты подгружаются отдельно.
+            self.load_taken([prefix])
+            slug = prefix + suffix
+            number += 1
+        self.next_number[base] = number
+        self.taken.add(slug)
+        return slug
+
+
+def lock_for_write():
+    """
+    Сразу берёт блокировку записи SQLite в открытой транзакции.
+
+    Без неё транзакция остаётся читающей до INSERT, и сайт успевает
+    сохранить заметку со slug, который порция считает свободным.
+    Пустой UPDATE блокирует запись так же, как BEGIN IMMEDIATE.
+    """
+    Note.objects.filter(pk=0).update(title="")
+
+
+def import_notes(author, items, batch_size=1000):
+    """
+    Создаёт заметки автора из словарей с ключами title, text и slug.
+
+    Заметки вставляются через bulk_create порциями по batch_size,
+    каждая порция в своей транзакции. Slug без указания берётся из
+    заголовка (см. slug_base); совпадающие slug получают числовой
+    суффикс.
+    Возвращает число созданных заметок.
+    """
+    allocator = SlugAllocator()
+    items = iter(items)
+    created = 0
+    while True:
+        batch = list(islice(items, batch_size))
+        if not batch:
+            return created
+        bases = [slug_base(item) for item in batch]
+        with transaction.atomic():
+            lock_for_write()
+            # Между порциями сайт мог занять slug, прочитанные раньше.
+            allocator.forget_taken()
+            allocator.load_taken(set(bases))
+            notes = [
+                Note(
+                    title=item["title"],
+                    text=item["text"],
+                    slug=allocator.allocate(base),
+                    author=author,
+                )
+                for item, base in zip(batch, bases)
+            ]
+            Note.objects.bulk_create(notes)
+        created += len(notes)
@@ -0,0 +1,69 @@
+import json
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from notes.importer import import_notes
+from notes.models import Note
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        "Импортирует заметки пользователя из JSONL-файла. "
+        'Каждая строка: {"title": ..., "text": ..., "slug": ...}, '
+        "slug можно не указывать."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("username", help="Автор заметок.")
+        parser.add_argument("path", help="Путь к JSONL-файлу.")
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def read_items(self, path):
+        """Разбирает файл построчно, не загружая его целиком."""
+        with open(path, encoding="utf-8") as file:
+            for number, line in enumerate(file, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    item = json.loads(line)
+                except json.JSONDecodeError as error:
+                    raise CommandError(f"Строка {number}: {error}")
+                problem = self.check_item(item)
+                if problem:
+                    raise CommandError(f"Строка {number}: {problem}")
+                yield item
+
+    def check_item(self, item):
+        """Причина, по которой заметку нельзя импортировать, или None."""
+        if not isinstance(item, dict):
+            return "ожидался объект JSON"
+        for field in ("title", "text"):
+            if not isinstance(item.get(field), str) or not item[field]:
+                return f"нет поля {field}"
+        max_length = Note._meta.get_field("title").max_length
+        if len(item["title"]) > max_length:
+            return f"заголовок длиннее {max_length} символов"
+        if not isinstance(item.get("slug") or "", str):
+            return "slug должен быть строкой"
+        return None
+
+    def handle(self, *args, **options):
+        try:
+            author = User.objects.get(username=options["username"])
+        except User.DoesNotExist:
+            raise CommandError("Пользователь не найден.")
+        started = time.monotonic()
+        created = import_notes(
+            author,
+            self.read_items(options["path"]),
+            batch_size=options["batch_size"],
+        )
+        elapsed = time.monotonic() - started
+        self.stdout.write(
+            f"Создано заметок: {created}, "
+            f"{created / elapsed if elapsed else 0:.0f} заметок/с"
+        )
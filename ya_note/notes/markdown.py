@@ -0,0 +1,326 @@
+"""
+Отображение текста заметок в HTML.
+
+Поддерживается подмножество Markdown: заголовки, абзацы, списки,
+цитаты, блоки кода, горизонтальные линии, выделение, код в строке
+и ссылки. Исходный текст экранируется, поэтому HTML из заметки
+выводится как текст.
+
+Готовый HTML кэшируется по хэшу текста: повторные просмотры
+неизменённой заметки не разбирают её заново.
+"""
+import hashlib
+import re
+from bisect import bisect_left
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+NOTE_HTML_KEY = "note_html:{}"
+MAX_QUOTE_DEPTH = 16
+
+FENCE = re.compile(r"^(```|~~~)")
+HEADING = re.compile(r"^(#{1,6})\s+(.*?)\s*#*\s*$")
+RULE = re.compile(r"^\s{0,3}([-*_])(\s*\1){2,}\s*$")
+BULLET = re.compile(r"^\s{0,3}[-*+]\s+(.*)$")
+NUMBERED = re.compile(r"^\s{0,3}\d+[.)]\s+(.*)$")
+QUOTE = re.compile(r"^\s{0,3}>\s?(.*)$")
+
+BACKTICKS = re.compile(r"`+")
+LINK_OPENER = re.compile(r"\[")
+URL_END = re.compile(r"[)\s]")
+DELIMITER = re.compile(r"[*_]")
+SAFE_URL = re.compile(r"^(https?://|mailto:|/|#|\.)", re.IGNORECASE)
+
+# Разметка в строке разбирается за один проход: закрывающий разделитель
+# для каждого открывающего не ищется заново перебором до конца текста,
+# иначе текст из одних «[» или «*» разбирался бы за квадратичное время.
+
+
+def _positions(text, char):
+    return [index for index, found in enumerate(text) if found == char]
+
+
+def _code_spans(text):
+    """
+    Код в строке: (начало, конец, код).
+
+    Открывающую серию обратных кавычек закрывает ближайшая следующая
+    серия той же длины в пределах строки.
+    """
+    runs = [match.span() for match in BACKTICKS.finditer(text)]
+    next_same = [None] * len(runs)
+    last = {}
+    for index in range(len(runs) - 1, -1, -1):
+        start, end = runs[index]
+        next_same[index] = last.get(end - start)
+        last[end - start] = index
+    newlines = _positions(text, "\n")
+    index = 0
+    while index < len(runs):
+        start, end = runs[index]
+        closer = next_same[index]
+        if closer is not None:
+            close_start, close_end = runs[closer]
+            newline = bisect_left(newlines, end)
+            if newline == len(newlines) or newlines[newline] > close_start:
+                yield start, close_end, text[end:close_start]
+                index = closer + 1
+                continue
+        index += 1
+
+
+def _links(text):
+    """
+    Ссылки [текст](адрес): (начало, конец, текст, адрес).
+
+    Ближайшие «]» и конец адреса запоминаются, поэтому каждый символ
+    просматривается не больше двух раз.
+    """
+    position = close = stop = 0
+    for match in LINK_OPENER.finditer(text):
+        start = match.start()
+        if start < position:
+            continue
+        if close <= start:
+            close = text.find("]", start)
+            if close == -1:
+                return
+        if close == start + 1 or text[close + 1:close + 2] != "(":
+            continue
+        url_start = close + 2
+        if stop < url_start:
+            url_end = URL_END.search(text, url_start)
+            stop = url_end.start() if url_end else len(text)
+        if stop == url_start or text[stop:stop + 1] != ")":
+            continue
+        yield start, stop + 1, text[start + 1:close], text[url_start:stop]
+        position = stop + 1
+
+
+def _is_word(text, index):
+    return 0 <= index < len(text) and (
+        text[index].isalnum() or text[index] == "_"
+    )
+
+
+def _is_visible(text, index):
+    return 0 <= index < len(text) and not text[index].isspace()
+
+
+def _closers(text, delimiter):
+    """Позиции, где delimiter может закрыть выделение."""
+    size = len(delimiter)
+    return [
+        index
+        for index in range(len(text) - size + 1)
+        if text.startswith(delimiter, index)
+        and _is_visible(text, index - 1)
+        and not _is_word(text, index + size)
+    ]
+
+
+def _delimited(text, delimiters, tag):
+    r"""
+    Оборачивает в tag текст между парными разделителями.
+
+    Правило то же, что у выражения
+    ``(?<!\w)(d)(?=\S)(.+?)(?<=\S)\1(?!\w)``: выделение не выходит
+    за строку и закрывается ближайшим подходящим разделителем.
+    Кандидаты в закрывающие находятся заранее, ближайший из них —
+    двоичным поиском.
+    """
+    closers = {
+        delimiter: _closers(text, delimiter) for delimiter in delimiters
+    }
+    newlines = _positions(text, "\n")
+    parts = []
+    position = 0
+    for match in DELIMITER.finditer(text):
+        start = match.start()
+        if start < position or _is_word(text, start - 1):
+            continue
+        for delimiter in delimiters:
+            size = len(delimiter)
+            if not text.startswith(delimiter, start) or not _is_visible(
+                text, start + size
+            ):
+                continue
+            candidates = closers[delimiter]
+            closer = bisect_left(candidates, start + size + 1)
+            newline = bisect_left(newlines, start)
+            limit = newlines[newline] if newline < len(newlines) else None
+            if closer == len(candidates) or (
+                limit is not None and candidates[closer] > limit
+            ):
+                continue
+            end = candidates[closer]
+            parts.append(text[position:start])
+            parts.append(f"<{tag}>{text[start + size:end]}</{tag}>")
+            position = end + size
+            break
+    parts.append(text[position:])
+    return "".join(parts)
+
+
+def _link(text, url):
+    if not SAFE_URL.match(url):
+        return _emphasis(text)
+    return f'<a href="{url}">{_emphasis(text)}</a>'
+
+
+def render_inline(text):
+    """HTML для текста внутри блока; код в обратных кавычках не трогается."""
+    parts = []
+    position = 0
+    for start, end, code in _code_spans(text):
+        parts.append(_render_span(text[position:start]))
+        parts.append(f"<code>{escape(code.strip())}</code>")
+        position = end
+    parts.append(_render_span(text[position:]))
+    return "".join(parts)
+
+
+def _render_span(text):
+    """
+    HTML для текста без кода; адреса ссылок выделение не затрагивает.
+
+    Ссылки, как и код, вырезаются до разбора выделения, иначе
+    звёздочки и подчёркивания в адресе превращались бы в теги.
+    """
+    text = escape(text)
+    parts = []
+    position = 0
+    for start, end, link_text, url in _links(text):
+        parts.append(_emphasis(text[position:start]))
+        parts.append(_link(link_text, url))
+        position = end
+    parts.append(_emphasis(text[position:]))
+    return "".join(parts)
+
+
+def _emphasis(text):
+    text = _delimited(text, ("**", "__"), "strong")
+    return _delimited(text, ("*", "_"), "em")
+
+
+def _list_item(line):
+    for pattern, tag in ((BULLET, "ul"), (NUMBERED, "ol")):
+        match = pattern.match(line)
+        if match:
+            return tag, match.group(1)
+    return None, None
+
+
+def _code_block(lines, index):
+    fence = FENCE.match(lines[index])
+    if not fence:
+        return None
+    end = index + 1
+    while end < len(lines) and not lines[end].startswith(fence.group(1)):
+        end += 1
+    code = escape("\n".join(lines[index + 1:end]))
+    return f"<pre><code>{code}</code></pre>", end + 1
+
+
+def _heading(lines, index):
+    heading = HEADING.match(lines[index])
+    if not heading:
+        return None
+    level = len(heading.group(1))
+    text = render_inline(heading.group(2))
+    return f"<h{level}>{text}</h{level}>", index + 1
+
+
+def _rule(lines, index):
+    if not RULE.match(lines[index]):
+        return None
+    return "<hr>", index + 1
+
+
+def _list(lines, index):
+    tag, item = _list_item(lines[index])
+    if not tag:
+        return None
+    items = []
+    while True:
+        items.append(f"<li>{render_inline(item)}</li>")
+        index += 1
+        if index == len(lines):
+            break
+        next_tag, item = _list_item(lines[index])
+        if next_tag != tag:
+            break
+    return f"<{tag}>{''.join(items)}</{tag}>", index
+
+
+def _quote(lines, index, depth):
+    quote = []
+    while index < len(lines):
+        match = QUOTE.match(lines[index])
+        if not match:
+            break
+        quote.append(match.group(1))
+        index += 1
+    if not quote:
+        return None
+    text = render_markdown("\n".join(quote), depth + 1)
+    return f"<blockquote>{text}</blockquote>", index
+
+
+BLOCKS = (_code_block, _heading, _rule, _list)
+
+
+def _block(lines, index, depth):
+    for block in BLOCKS:
+        result = block(lines, index)
+        if result:
+            return result
+    # Цитата разбирается рекурсивно; глубже MAX_QUOTE_DEPTH строки
+    # с ">" остаются текстом, чтобы не исчерпать стек.
+    if depth < MAX_QUOTE_DEPTH:
+        return _quote(lines, index, depth)
+    return None
+
+
+def render_markdown(text, depth=0):
+    """HTML для текста заметки; depth — глубина вложенности цитаты."""
+    lines = text.splitlines()
+    html = []
+    paragraph = []
+    index = 0
+    while index < len(lines) or paragraph:
+        line = lines[index] if index < len(lines) else ""
+        result = _block(lines, index, depth) if line.strip() else None
+        if paragraph and (result or not line.strip()):
+            html.append("<p>" + render_inline("\n".join(paragraph)) + "</p>")
+            paragraph = []
+        if result:
+            block_html, index = result
+            html.append(block_html)
+            continue
+        if line.strip():
+            paragraph.append(line.strip())
+        index += 1
+    return "\n".join(html)
+
+
+def note_html_key(text):
+    return NOTE_HTML_KEY.format(hashlib.sha1(text.encode()).hexdigest())
+
+
+def get_note_html(text):
+    """HTML текста заметки из кэша; при промахе текст разбирается."""
+    key = note_html_key(text)
+    html = cache.get(key)
+    if html is None:
+        html = render_markdown(text)
+        cache.set(key, html, timeout=settings.NOTES_HTML_CACHE_TIMEOUT)
+    return mark_safe(html)
+
+
+def forget_note_html(*texts):
+    """Удаляет из кэша HTML прежних текстов заметок."""
+    cache.delete_many([note_html_key(text) for text in texts])
@@ -0,0 +1,24 @@
+# Generated by Django 3.2.15 on 2026-10-18 17:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("notes", "0002_note_author_id_index"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="note",
+            index=models.Index(
+                fields=["author", "slug"], name="note_author_slug_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="note",
+            index=models.Index(
+                fields=["author", "title"], name="note_author_title_idx"
+            ),
+        ),
+    ]
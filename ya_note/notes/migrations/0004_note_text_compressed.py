@@ -0,0 +1,60 @@
+# Generated by Django 3.2.15 on 2026-10-18 17:24
+
+from django.db import migrations
+from django.db.models.functions import Length
+
+import notes.fields
+
+BATCH_SIZE = 500
+
+
+def compress_texts(apps, schema_editor):
+    """Пересохраняет длинные тексты, чтобы поле сжало их."""
+    Note = apps.get_model("notes", "Note")
+    threshold = Note._meta.get_field("text").threshold
+    # В UTF-8 символ занимает не больше 4 байт.
+    notes = (
+        Note.objects.annotate(length=Length("text"))
+        .filter(length__gt=threshold // 4)
+        .only("id", "text")
+        .order_by("id")
+    )
+    last_id = 0
+    while True:
+        batch = list(notes.filter(id__gt=last_id)[:BATCH_SIZE])
+        if not batch:
+            return
+        Note.objects.bulk_update(batch, ["text"])
+        last_id = batch[-1].id
+
+
+def decompress_texts(apps, schema_editor):
+    """Записывает сжатые тексты обратно обычным текстом."""
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT id, text FROM notes_note WHERE typeof(text) = 'blob'"
+        )
+        rows = [
+            (notes.fields.decompress_text(data), note_id)
+            for note_id, data in cursor.fetchall()
+        ]
+        cursor.executemany(
+            "UPDATE notes_note SET text = %s WHERE id = %s", rows
+        )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("notes", "0003_note_prefix_indexes"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="note",
+            name="text",
+            field=notes.fields.CompressedTextField(
+                help_text="Добавьте подробностей", verbose_name="Текст"
+            ),
+        ),
+        migrations.RunPython(compress_texts, decompress_texts),
+    ]
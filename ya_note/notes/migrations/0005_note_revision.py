@@ -0,0 +1,68 @@
+# Generated by Django 3.2.15 on 2026-10-18 17:27
+
+from django.db import migrations, models
+import django.db.models.deletion
+import notes.fields
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("notes", "0004_note_text_compressed"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="NoteRevision",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "number",
+                    models.PositiveIntegerField(verbose_name="Номер версии"),
+                ),
+                (
+                    "title",
+                    models.CharField(
+                        max_length=100, verbose_name="Заголовок"
+                    ),
+                ),
+                (
+                    "text",
+                    notes.fields.CompressedTextField(
+                        blank=True, verbose_name="Текст"
+                    ),
+                ),
+                (
+                    "delta",
+                    models.JSONField(
+                        blank=True, null=True, verbose_name="Изменения"
+                    ),
+                ),
+                ("created", models.DateTimeField(auto_now_add=True)),
+                (
+                    "note",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="revisions",
+                        to="notes.note",
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ("number",),
+            },
+        ),
+        migrations.AddConstraint(
+            model_name="noterevision",
+            constraint=models.UniqueConstraint(
+                fields=("note", "number"), name="note_revision_number_uniq"
+            ),
+        ),
+    ]
@@ -1,8 +1,20 @@
+from functools import lru_cache
+
 from django.conf import settings
 from django.db import models
 
 from pytils.translit import slugify
 
+from .fields import CompressedTextField, CompressedTextQuerySet
+
+SLUG_MAX_LENGTH = 100
+
+
+@lru_cache(maxsize=10000)
+def slugify_title(title):
+    """Slug из заголовка; транслитерация одного заголовка запоминается."""
+    return slugify(title)[:SLUG_MAX_LENGTH]
+
 
 class Note(models.Model):
     title = models.CharField(
@@ -11,10 +23,10 @@ class Note(models.Model):
         default="Название заметки",
         help_text="Дайте короткое название заметке",
     )
-    text = models.TextField("Текст", help_text="Добавьте подробностей")
+    text = CompressedTextField("Текст", help_text="Добавьте подробностей")
     slug = models.SlugField(
         "Адрес для страницы с заметкой",
-        max_length=100,
+        max_length=SLUG_MAX_LENGTH,
         unique=True,
         blank=True,
         help_text=(
@@ -27,11 +39,58 @@ class Note(models.Model):
         on_delete=models.CASCADE,
     )
 
+    objects = CompressedTextQuerySet.as_manager()
+
+    class Meta:
+        indexes = (
+            models.Index(fields=("author", "id"), name="note_author_id_idx"),
+            models.Index(
+                fields=("author", "slug"), name="note_author_slug_idx"
+            ),
+            models.Index(
+                fields=("author", "title"), name="note_author_title_idx"
+            ),
+        )
+
     def __str__(self):
         return self.title
 
     def save(self, *args, **kwargs):
         if not self.slug:
-            max_slug_length = self._meta.get_field("slug").max_length
-            self.slug = slugify(self.title)[:max_slug_length]
+            self.slug = slugify_title(self.title)
         super().save(*args, **kwargs)
+
+
+class NoteRevision(models.Model):
+    """
+    Версия заметки.
+
+    Снимок хранит полный текст в text, остальные версии — дельту
+    к предыдущей версии в delta (см. notes.revisions).
+    """
+
+    note = models.ForeignKey(
+        Note, on_delete=models.CASCADE, related_name="revisions"
+    )
+    number = models.PositiveIntegerField("Номер версии")
+    title = models.CharField("Заголовок", max_length=100)
+    text = CompressedTextField("Текст", blank=True)
+    delta = models.JSONField("Изменения", null=True, blank=True)
+    created = models.DateTimeField(auto_now_add=True)
+
+    objects = CompressedTextQuerySet.as_manager()
+
+    class Meta:
+        ordering = ("number",)
+        constraints = (
+            models.UniqueConstraint(
+                fields=("note", "number"), name="note_revision_number_uniq"
+            ),
+        )
+
+    def __str__(self):
+        return f"{self.title} (версия {self.number})"
+
+    @property
+    def is_snapshot(self):
+        return self.delta is None
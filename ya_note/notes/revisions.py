@@ -0,0 +1,150 @@
+"""
+История изменений заметок.
+
+Каждая правка заметки сохраняется как NoteRevision. Текст хранится
+построчной дельтой к предыдущей версии, а каждая
+NOTES_REVISION_SNAPSHOT_INTERVAL-я версия — целиком. Поэтому для
+восстановления любой версии нужно не больше интервала записей.
+"""
+from difflib import SequenceMatcher
+
+from django.conf import settings
+from django.db.models import OuterRef, Subquery
+
+from .models import NoteRevision
+
+
+def make_delta(old, new):
+    """
+    Дельта, превращающая текст old в new.
+
+    Список из пар [начало, конец] — диапазонов строк old, которые
+    копируются без изменений, — и строк, которые вставляются как есть.
+    """
+    old_lines = old.splitlines(keepends=True)
+    new_lines = new.splitlines(keepends=True)
+    matcher = SequenceMatcher(None, old_lines, new_lines, autojunk=False)
+    delta = []
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal":
+            delta.append([i1, i2])
+        elif j1 != j2:
+            delta.append("".join(new_lines[j1:j2]))
+    return delta
+
+
+def apply_delta(old, delta):
+    """Восстанавливает текст по предыдущей версии и дельте."""
+    old_lines = old.splitlines(keepends=True)
+    return "".join(
+        part if isinstance(part, str) else "".join(old_lines[slice(*part)])
+        for part in delta
+    )
+
+
+def new_revisions(note, latest, previous_title=None, previous_text=None):
+    """
+    Несохранённые версии для текущего состояния заметки.
+
+    latest — последняя сохранённая версия с восстановленным текстом
+    (см. latest_revisions), дельта считается от неё: заметку могли
+    изменить в обход истории, например в админке. previous_title
+    и previous_text — заметка до правки. Если у заметки ещё нет истории
+    (она создана до появления версий), прежнее состояние становится
+    первой версией, чтобы его можно было восстановить.
+    """
+    revisions = []
+    if latest is None and previous_text is not None:
+        latest = NoteRevision(
+            note=note, number=1, title=previous_title, text=previous_text
+        )
+        revisions.append(latest)
+    number = latest.number + 1 if latest else 1
+    revision = NoteRevision(note=note, number=number, title=note.title)
+    interval = settings.NOTES_REVISION_SNAPSHOT_INTERVAL
+    if latest is None or (number - 1) % interval == 0:
+        revision.text = note.text
+    else:
+        revision.delta = make_delta(latest.text, note.text)
+    revisions.append(revision)
+    return revisions
+
+
+def latest_revisions(note_ids):
+    """
+    Последние версии заметок с восстановленным текстом.
+
+    Одним запросом читает последний снимок каждой заметки и дельты
+    после него. Возвращает {id заметки: версия}.
+    """
+    snapshot = (
+        NoteRevision.objects.filter(note=OuterRef("note"), delta__isnull=True)
+        .order_by("-number")
+        .values("number")[:1]
+    )
+    latest = {}
+    for revision in NoteRevision.objects.filter(
+        note__in=note_ids, number__gte=Subquery(snapshot)
+    ).order_by("note", "number"):
+        if revision.delta is not None:
+            previous = latest[revision.note_id]
+            revision.text = apply_delta(previous.text, revision.delta)
+        latest[revision.note_id] = revision
+    return latest
+
+
+def record_revision(note, previous_title=None, previous_text=None):
+    """Сохраняет текущее состояние заметки как новую версию."""
+    latest = latest_revisions([note.pk]).get(note.pk)
+    NoteRevision.objects.bulk_create(
+        new_revisions(note, latest, previous_title, previous_text)
+    )
+
+
+def rebuild_revision(note, number):
+    """
+    Версия number заметки с восстановленным текстом или None.
+
+    Одним запросом читает ближайший снимок не позже number и дельты
+    после него.
+    """
+    snapshot = (
+        note.revisions.filter(number__lte=number, delta__isnull=True)
+        .order_by("-number")
+        .values("number")[:1]
+    )
+    chain = list(
+        note.revisions.filter(
+            number__lte=number, number__gte=Subquery(snapshot)
+        ).order_by("number")
+    )
+    if not chain or chain[-1].number != number:
+        return None
+    text = chain[0].text
+    for revision in chain[1:]:
+        text = apply_delta(text, revision.delta)
+    revision = chain[-1]
+    revision.text = text
+    return revision
+
+
+def record_bulk_revisions(notes, changes):
+    """
+    Сохраняет версии заметок после массового изменения полей.
+
+    notes — заметки в состоянии до правки, changes — новые значения
+    полей. Последние версии читаются одним запросом, все новые версии
+    пишутся другим.
+    """
+    latest = latest_revisions([note.pk for note in notes])
+    revisions = []
+    for note in notes:
+        previous_title, previous_text = note.title, note.text
+        for field, value in changes.items():
+            setattr(note, field, value)
+        revisions.extend(
+            new_revisions(
+                note, latest.get(note.pk), previous_title, previous_text
+            )
+        )
+    NoteRevision.objects.bulk_create(revisions)
@@ -1,7 +1,15 @@
-from django.test import TestCase, Client
+import io
+import json
+import time
+import zipfile
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase, Client, override_settings
 from django.urls import reverse
 from django.contrib.auth import get_user_model
 
+from notes import markdown
 from notes.models import Note
 
 
@@ -58,3 +66,197 @@ class ContentTest(TestCase):
         )
         self.assertEqual(response.status_code, 200)
         self.assertTrue("form" in response.context)
+
+    @override_settings(NOTES_COUNT_ON_LIST_PAGE=2)
+    def test_notes_list_paginated_by_cursor(self):
+        notes = [
+            Note.objects.create(
+                title=f"Test Note {i}",
+                text="Test Note content",
+                author=self.user1,
+            )
+            for i in range(5)
+        ]
+        shown = []
+        params = {}
+        while True:
+            with self.assertNumQueries(3):
+                response = self.client1.get(reverse(self.NOTES_LIST), params)
+            shown += response.context["object_list"]
+            if response.context["next_cursor"] is None:
+                break
+            params = {"after": response.context["next_cursor"]}
+        self.assertEqual(shown, notes)
+
+    def test_notes_list_does_not_load_text(self):
+        Note.objects.create(
+            title="Test Note", text="Test Note content", author=self.user1
+        )
+        response = self.client1.get(reverse(self.NOTES_LIST))
+        note = response.context["object_list"][0]
+        self.assertIn("text", note.get_deferred_fields())
+
+    def test_export_notes(self):
+        note = Note.objects.create(
+            title="Test Note", text="Test Note content", author=self.user1
+        )
+        Note.objects.create(
+            title="Other Note", text="Other content", author=self.user2
+        )
+        response = self.client1.get(
+            reverse("notes:export"), {"format": "jsonl"}
+        )
+        self.assertTrue(response.streaming)
+        lines = b"".join(response.streaming_content).decode().splitlines()
+        self.assertEqual(
+            [json.loads(line) for line in lines],
+            [{"title": note.title, "text": note.text, "slug": note.slug}],
+        )
+
+        response = self.client1.get(reverse("notes:export"), {"format": "zip"})
+        self.assertTrue(response.streaming)
+        archive = zipfile.ZipFile(
+            io.BytesIO(b"".join(response.streaming_content))
+        )
+        self.assertEqual(archive.namelist(), [f"{note.slug}.md"])
+        self.assertEqual(
+            archive.read(f"{note.slug}.md").decode(),
+            "# Test Note\n\nTest Note content\n",
+        )
+
+    @override_settings(NOTES_AUTOCOMPLETE_LIMIT=2)
+    def test_autocomplete(self):
+        for title in ("Заметка раз", "Заметка два", "Заметка три", "Другая"):
+            Note.objects.create(
+                title=title, text="Test Note content", author=self.user1
+            )
+        Note.objects.create(
+            title="Заметка чужая", text="Test Note content", author=self.user2
+        )
+        # Сессия, пользователь, поиск по slug и по заголовку.
+        with self.assertNumQueries(4):
+            response = self.client1.get(
+                reverse("notes:autocomplete"), {"q": "Замет"}
+            )
+        results = response.json()["results"]
+        self.assertEqual(
+            [result["title"] for result in results],
+            ["Заметка два", "Заметка раз"],
+        )
+        self.assertEqual(
+            results[0]["url"],
+            reverse("notes:detail", args=(results[0]["slug"],)),
+        )
+
+        response = self.client1.get(reverse("notes:autocomplete"), {"q": "dr"})
+        self.assertEqual(
+            [result["title"] for result in response.json()["results"]],
+            ["Другая"],
+        )
+
+    def test_revision_page_shows_old_text(self):
+        note = Note.objects.create(
+            title="Test Note", text="Test Note content", author=self.user1
+        )
+        self.client1.post(
+            reverse(self.NOTES_EDIT, kwargs={"slug": note.slug}),
+            data={
+                "title": "New Title",
+                "text": "New content",
+                "slug": note.slug,
+            },
+        )
+        url = reverse(
+            "notes:revision", kwargs={"slug": note.slug, "number": 1}
+        )
+
+        response = self.client1.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context["revision"].title, "Test Note")
+        self.assertContains(response, "Test Note content")
+
+        response = self.client1.get(
+            reverse("notes:revisions", kwargs={"slug": note.slug})
+        )
+        self.assertEqual(
+            [r.number for r in response.context["revisions"]], [2, 1]
+        )
+
+        self.assertEqual(self.client2.get(url).status_code, 404)
+        response = self.client1.get(
+            reverse("notes:revision", kwargs={"slug": note.slug, "number": 3})
+        )
+        self.assertEqual(response.status_code, 404)
+
+    def test_note_text_rendered_as_markdown(self):
+        note = Note.objects.create(
+            title="Test Note",
+            text="# План\n\n- **первый** пункт\n- `<script>`",
+            author=self.user1,
+        )
+        response = self.client1.get(
+            reverse("notes:detail", kwargs={"slug": note.slug})
+        )
+        self.assertContains(response, "<h1>План</h1>", html=True)
+        self.assertContains(
+            response,
+            "<ul><li><strong>первый</strong> пункт</li>"
+            "<li><code>&lt;script&gt;</code></li></ul>",
+            html=True,
+        )
+        self.assertNotContains(response, "<script>")
+
+    def test_markdown_link_url_not_emphasized(self):
+        html = markdown.render_markdown("[*x*](http://a.com/*b*_c_) *d*")
+        self.assertEqual(
+            html,
+            '<p><a href="http://a.com/*b*_c_"><em>x</em></a> <em>d</em></p>',
+        )
+
+    def test_markdown_deep_quote_does_not_exhaust_stack(self):
+        html = markdown.render_markdown(">" * 1200 + " text")
+        self.assertEqual(
+            html.count("<blockquote>"), markdown.MAX_QUOTE_DEPTH
+        )
+        self.assertIn("text", html)
+
+    def test_markdown_unbalanced_markup_rendered_in_linear_time(self):
+        for text in (
+            "[" * 40000,
+            "[a](" * 10000,
+            "*a " * 10000,
+            "**a " * 10000,
+            "``a`" * 10000,
+        ):
+            with self.subTest(text=text[:8]):
+                started = time.perf_counter()
+                markdown.render_markdown(text)
+                self.assertLess(time.perf_counter() - started, 1)
+
+    def test_rendered_note_cached_until_update(self):
+        cache.clear()
+        note = Note.objects.create(
+            title="Test Note", text="*Test Note content*", author=self.user1
+        )
+        url = reverse("notes:detail", kwargs={"slug": note.slug})
+        with mock.patch.object(
+            markdown, "render_markdown", wraps=markdown.render_markdown
+        ) as render:
+            self.client1.get(url)
+            self.client1.get(url)
+            self.assertEqual(render.call_count, 1)
+
+            self.client1.post(
+                reverse(self.NOTES_EDIT, kwargs={"slug": note.slug}),
+                data={
+                    "title": note.title,
+                    "text": "*New content*",
+                    "slug": note.slug,
+                },
+            )
+            self.assertIsNone(
+                cache.get(markdown.note_html_key("*Test Note content*"))
+            )
+            response = self.client1.get(url)
+            self.assertEqual(render.call_count, 2)
+        self.assertContains(response, "<em>New content</em>")
@@ -1,9 +1,21 @@
+import json
+from io import StringIO
+from pathlib import Path
+from tempfile import TemporaryDirectory
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.db.models import F
 from django.urls import reverse
 from pytils.translit import slugify
-from django.test import TestCase, Client
+from django.test import TestCase, Client, override_settings
 from django.contrib.auth import get_user_model
 
-from notes.models import Note
+from notes.fields import CompressedText
+from notes.importer import import_notes
+from notes.models import Note, NoteRevision
+from notes.revisions import rebuild_revision
 
 
 User = get_user_model()
@@ -130,3 +142,335 @@ class LogicTest(TestCase):
         )
         self.assertEqual(response.status_code, 404)
         self.assertEqual(Note.objects.count(), 1)
+
+    def test_import_notes_resolves_slug_collisions(self):
+        Note.objects.create(
+            title="Test Note", text="Test Note content", author=self.user2
+        )
+        items = [
+            {"title": "Test Note", "text": "Imported"},
+            {"title": "Other Note", "text": "Imported"},
+            {"title": "Test Note", "text": "Imported"},
+            {"title": "Imported", "text": "Imported", "slug": "test-note"},
+        ]
+        # На порцию: SAVEPOINT, блокировка записи, поиск занятых slug,
+        # INSERT, RELEASE.
+        with self.assertNumQueries(10):
+            created = import_notes(self.user1, items, batch_size=2)
+
+        self.assertEqual(created, 4)
+        self.assertEqual(
+            list(
+                Note.objects.filter(author=self.user1)
+                .order_by("id")
+                .values_list("slug", flat=True)
+            ),
+            ["test-note-1", "other-note", "test-note-2", "test-note-3"],
+        )
+
+    def test_import_notes_fixes_unusable_slugs(self):
+        items = [
+            {"title": "Note", "text": "Imported", "slug": "my note/1"},
+            {"title": "Заметка", "text": "Imported", "slug": "/"},
+            {"title": "???", "text": "Imported"},
+            {"title": "Long", "text": "Imported", "slug": "a" * 150},
+        ]
+        import_notes(self.user1, items)
+
+        self.assertEqual(
+            list(
+                Note.objects.filter(author=self.user1)
+                .order_by("id")
+                .values_list("slug", flat=True)
+            ),
+            ["my-note1", "zametka", "note", "a" * 100],
+        )
+        self.client.force_login(self.user1)
+        response = self.client.get(reverse("notes:list"))
+        self.assertEqual(response.status_code, 200)
+
+    def test_import_notes_checks_truncated_slugs(self):
+        long_slug = "a" * 100
+        for slug in (long_slug, "a" * 98 + "-1"):
+            Note.objects.create(
+                title="Long", text="Text", slug=slug, author=self.user2
+            )
+        created = import_notes(
+            self.user1, [{"title": "Long", "text": "Text", "slug": long_slug}]
+        )
+
+        self.assertEqual(created, 1)
+        self.assertEqual(
+            Note.objects.filter(author=self.user1).get().slug,
+            "a" * 98 + "-2",
+        )
+
+    def test_import_notes_command_rejects_invalid_lines(self):
+        invalid_items = (
+            {"text": "No title"},
+            {"title": "No text"},
+            ["not", "an", "object"],
+            {"title": "x" * 101, "text": "Too long title"},
+            {"title": "Title", "text": "Text", "slug": 42},
+        )
+        with TemporaryDirectory() as directory:
+            path = Path(directory) / "notes.jsonl"
+            for item in invalid_items:
+                with self.subTest(item=item):
+                    path.write_text(
+                        json.dumps({"title": "Valid", "text": "Valid"})
+                        + "\n"
+                        + json.dumps(item),
+                        encoding="utf-8",
+                    )
+                    with self.assertRaisesMessage(CommandError, "Строка 2"):
+                        call_command(
+                            "import_notes",
+                            self.user1.username,
+                            str(path),
+                            stdout=StringIO(),
+                        )
+                    self.assertFalse(Note.objects.exists())
+
+    def test_long_note_text_stored_compressed(self):
+        long_text = "Строка длинного лога\n" * 1000
+        long_note = Note.objects.create(
+            title="Long Note", text=long_text, author=self.user1
+        )
+        short_note = Note.objects.create(
+            title="Short Note", text="Test Note content", author=self.user1
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT id, typeof(text), length(text) FROM notes_note"
+            )
+            stored = {note_id: (kind, size) for note_id, kind, size in cursor}
+        self.assertEqual(stored[long_note.pk][0], "blob")
+        self.assertLess(stored[long_note.pk][1], len(long_text.encode()) / 10)
+        self.assertEqual(stored[short_note.pk][0], "text")
+
+        self.assertEqual(Note.objects.get(pk=long_note.pk).text, long_text)
+        self.assertEqual(
+            Note.objects.get(pk=short_note.pk).text, "Test Note content"
+        )
+
+    def test_compressed_text_is_str_in_values(self):
+        long_text = "Строка длинного лога\n" * 1000
+        note = Note.objects.create(
+            title="Long Note", text=long_text, author=self.user1
+        )
+        notes = Note.objects.filter(pk=note.pk)
+
+        self.assertEqual(
+            list(notes.values_list("text", flat=True)), [long_text]
+        )
+        self.assertEqual(notes.values("text").get()["text"], long_text)
+        self.assertEqual(
+            notes.values_list("title", "text", named=True).get().text,
+            long_text,
+        )
+        self.assertEqual(
+            notes.annotate(body=F("text")).values_list("body")[0],
+            (long_text,),
+        )
+        # Экземпляр модели распаковывает текст только при обращении.
+        loaded = notes.get()
+        self.assertIsInstance(loaded.__dict__["text"], CompressedText)
+        self.assertEqual(loaded.text, long_text)
+
+    @override_settings(NOTES_REVISION_SNAPSHOT_INTERVAL=5)
+    def test_note_edits_are_kept_as_revisions(self):
+        self.client.login(username="testuser1", password="12345")
+        lines = [f"Строка {number}\n" for number in range(50)]
+        # Форма обрезает пробельные символы по краям текста.
+        texts = ["".join(lines).strip()]
+        self.client.post(
+            reverse(self.NOTES_ADD),
+            data={"title": "Test Note", "text": texts[0], "slug": "note"},
+        )
+        for number in range(1, 12):
+            lines[number * 3] = f"Изменённая строка {number}\n"
+            texts.append("".join(lines).strip())
+            self.client.post(
+                reverse(self.NOTES_EDIT, kwargs={"slug": "note"}),
+                data={"title": "Test Note", "text": texts[-1], "slug": "note"},
+            )
+
+        note = Note.objects.get(slug="note")
+        revisions = list(note.revisions.all())
+        self.assertEqual([r.number for r in revisions], list(range(1, 13)))
+        self.assertEqual(
+            [r.number for r in revisions if r.is_snapshot], [1, 6, 11]
+        )
+        self.assertLess(len(str(revisions[1].delta)), len(texts[1]) // 5)
+        for number, text in enumerate(texts, start=1):
+            with self.assertNumQueries(1):
+                revision = rebuild_revision(note, number)
+            self.assertEqual(revision.text, text)
+        self.assertIsNone(rebuild_revision(note, 13))
+
+    def test_revisions_survive_edits_outside_history(self):
+        self.client.login(username="testuser1", password="12345")
+        url = reverse(self.NOTES_EDIT, kwargs={"slug": "note"})
+        texts = ["Первая\nВторая\nТретья", "Первая\nВторая"]
+        self.client.post(
+            reverse(self.NOTES_ADD),
+            data={"title": "Test Note", "text": texts[0], "slug": "note"},
+        )
+        self.client.post(
+            url, data={"title": "Test Note", "text": texts[1], "slug": "note"}
+        )
+        # Правка в обход истории, как из админки или update().
+        Note.objects.filter(slug="note").update(text="Чужая\nправка")
+        texts.append("Чужая\nправка\nИ ещё строка")
+        self.client.post(
+            url, data={"title": "Test Note", "text": texts[2], "slug": "note"}
+        )
+        texts.append("И ещё строка")
+        self.client.post(
+            url, data={"title": "Test Note", "text": texts[3], "slug": "note"}
+        )
+
+        note = Note.objects.get(slug="note")
+        for number, text in enumerate(texts, start=1):
+            self.assertEqual(rebuild_revision(note, number).text, text)
+
+    def test_unchanged_note_does_not_add_revision(self):
+        self.client.login(username="testuser1", password="12345")
+        note = Note.objects.create(
+            title="Test Note", text="Test Note content", author=self.user1
+        )
+        note_data = {"title": note.title, "text": note.text, "slug": note.slug}
+        url = reverse(self.NOTES_EDIT, kwargs={"slug": note.slug})
+
+        self.client.post(url, data=note_data)
+        self.assertFalse(note.revisions.exists())
+
+        note_data["text"] = "New content"
+        self.client.post(url, data=note_data)
+        self.assertEqual(rebuild_revision(note, 1).text, "Test Note content")
+        self.assertEqual(rebuild_revision(note, 2).text, "New content")
+
+    def test_note_writes_answer_json(self):
+        self.client.login(username="testuser1", password="12345")
+        json_headers = {"HTTP_ACCEPT": "application/json"}
+
+        response = self.client.post(
+            reverse(self.NOTES_ADD),
+            data={"title": "Test Note", "text": "Test Note content"},
+            content_type="application/json",
+            **json_headers,
+        )
+        self.assertEqual(response.status_code, 201)
+        note = Note.objects.get()
+        self.assertEqual(
+            response.json(),
+            {
+                "id": note.pk,
+                "title": "Test Note",
+                "text": "Test Note content",
+                "slug": note.slug,
+                "url": reverse("notes:detail", args=(note.slug,)),
+            },
+        )
+        self.assertEqual(note.author, self.user1)
+        self.assertFalse(note.revisions.exists())
+
+        response = self.client.post(
+            reverse(self.NOTES_ADD),
+            data={"title": "Test Note", "text": ""},
+            **json_headers,
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(set(response.json()["errors"]), {"text", "slug"})
+
+        edit_url = reverse(self.NOTES_EDIT, kwargs={"slug": note.slug})
+        response = self.client.post(
+            edit_url,
+            data={"title": "Test Note", "text": "New", "slug": note.slug},
+            **json_headers,
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["text"], "New")
+        # История начинается с первой правки: версия 1 — текст до неё.
+        self.assertEqual(
+            [rebuild_revision(note, number).text for number in (1, 2)],
+            ["Test Note content", "New"],
+        )
+
+        response = self.client.post(
+            edit_url,
+            data="[]",
+            content_type="application/json",
+            **json_headers,
+        )
+        self.assertEqual(response.status_code, 400)
+
+        self.client.login(username="testuser2", password="12345")
+        delete_url = reverse(self.NOTES_DELETE, kwargs={"slug": note.slug})
+        response = self.client.post(delete_url, **json_headers)
+        self.assertEqual(response.status_code, 404)
+
+        self.client.login(username="testuser1", password="12345")
+        response = self.client.post(delete_url, **json_headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["slug"], note.slug)
+        self.assertFalse(Note.objects.exists())
+
+    def test_bulk_delete_only_own_notes(self):
+        self.client.login(username="testuser1", password="12345")
+        for number in range(20):
+            Note.objects.create(
+                title=f"Note {number}", text="Text", author=self.user1
+            )
+        other_note = Note.objects.create(
+            title="Other", text="Text", author=self.user2
+        )
+        slugs = [f"note-{number}" for number in range(15)]
+        slugs += [other_note.slug, "missing"]
+
+        with self.assertNumQueries(7):
+            response = self.client.post(
+                reverse("notes:bulk"),
+                data={"action": "delete", "slugs": slugs},
+                content_type="application/json",
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {"action": "delete", "count": 15})
+        self.assertEqual(Note.objects.filter(author=self.user1).count(), 5)
+        self.assertTrue(Note.objects.filter(pk=other_note.pk).exists())
+
+    def test_bulk_update_keeps_revisions(self):
+        self.client.login(username="testuser1", password="12345")
+        self.client.post(
+            reverse(self.NOTES_ADD),
+            data={"title": "First", "text": "Old text"},
+        )
+        Note.objects.create(title="Second", text="Old", author=self.user1)
+        # Новые заметки создаются без версий.
+        self.assertFalse(NoteRevision.objects.exists())
+
+        response = self.client.post(
+            reverse("notes:bulk"),
+            data={
+                "action": "update",
+                "slugs": ["first", "second"],
+                "text": "New text",
+            },
+        )
+        self.assertEqual(response.json(), {"action": "update", "count": 2})
+        for note in Note.objects.all():
+            self.assertEqual(note.text, "New text")
+            self.assertEqual(
+                [r.number for r in note.revisions.all()], [1, 2]
+            )
+        first = Note.objects.get(slug="first")
+        self.assertEqual(rebuild_revision(first, 1).text, "Old text")
+        self.assertEqual(rebuild_revision(first, 2).text, "New text")
+
+        response = self.client.post(
+            reverse("notes:bulk"),
+            data={"action": "update", "slugs": ["first"]},
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("__all__", response.json()["errors"])
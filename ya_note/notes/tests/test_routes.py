@@ -1,4 +1,7 @@
-from django.test import TestCase, Client
+import json
+import tempfile
+
+from django.test import TestCase, Client, override_settings
 from django.urls import reverse
 from django.contrib.auth import get_user_model
 
@@ -118,3 +121,28 @@ class RoutesTest(TestCase):
 
         response = self.client.get(reverse("users:logout"))
         self.assertEqual(response.status_code, 200)
+
+    def test_server_timing_header(self):
+        self.client.login(username="testuser", password="12345")
+        with self.assertLogs("monitoring.requests", "INFO") as logs:
+            response = self.client.get(reverse("notes:list"))
+        self.assertIn("Server-Timing", response)
+        record = json.loads(logs.records[-1].getMessage())
+        self.assertEqual(record["url_name"], "notes:list")
+        self.assertIn(
+            f'db;desc="{record["queries"]} queries"',
+            response["Server-Timing"],
+        )
+
+    def test_metrics_endpoint(self):
+        self.client.login(username="testuser", password="12345")
+        with tempfile.TemporaryDirectory() as directory:
+            with override_settings(MONITORING_METRICS_DIR=directory):
+                self.client.get(reverse("notes:list"))
+                self.client.get(reverse("notes:list"))
+                response = self.client.get(reverse("monitoring:metrics"))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(
+            'http_request_duration_seconds_count{view="notes:list"} 2',
+            response.content.decode().splitlines(),
+        )
@@ -9,7 +9,24 @@ urlpatterns = [
     path("add/", views.NoteCreate.as_view(), name="add"),
     path("edit/<slug:slug>/", views.NoteUpdate.as_view(), name="edit"),
     path("note/<slug:slug>/", views.NoteDetail.as_view(), name="detail"),
+    path(
+        "note/<slug:slug>/revisions/",
+        views.NoteRevisions.as_view(),
+        name="revisions",
+    ),
+    path(
+        "note/<slug:slug>/revisions/<int:number>/",
+        views.NoteRevisionDetail.as_view(),
+        name="revision",
+    ),
     path("delete/<slug:slug>/", views.NoteDelete.as_view(), name="delete"),
     path("notes/", views.NotesList.as_view(), name="list"),
+    path("bulk/", views.NoteBulk.as_view(), name="bulk"),
+    path("export/", views.NoteExport.as_view(), name="export"),
+    path(
+        "autocomplete/",
+        views.NoteAutocomplete.as_view(),
+        name="autocomplete",
+    ),
     path("done/", views.NoteSuccess.as_view(), name="success"),
 ]
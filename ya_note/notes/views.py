@@ -1,9 +1,22 @@
+import json
+
+from django.conf import settings
 from django.contrib.auth.mixins import LoginRequiredMixin
-from django.urls import reverse_lazy
+from django.core.exceptions import BadRequest
+from django.db import transaction
+from django.http import Http404, JsonResponse, StreamingHttpResponse
+from django.urls import reverse, reverse_lazy
 from django.views import generic
 
-from .forms import NoteForm
-from .models import Note
+from .export import export_jsonl, export_zip
+from .forms import NoteBulkForm, NoteForm
+from .markdown import forget_note_html, get_note_html
+from .models import Note, slugify_title
+from .revisions import (
+    rebuild_revision,
+    record_bulk_revisions,
+    record_revision,
+)
 
 
 class Home(generic.TemplateView):
@@ -29,39 +42,306 @@ class NoteBase(LoginRequiredMixin):
         return self.model.objects.filter(author=self.request.user)
 
 
-class NoteCreate(NoteBase, generic.CreateView):
-    """Добавление заметки."""
+class JsonFormMixin:
+    """
+    Формы, которые принимают и возвращают JSON.
+
+    Данные можно прислать как обычной формой, так и JSON-объектом в теле
+    запроса. Клиенту, который просит application/json, ошибки формы
+    возвращаются JSON-ом.
+    """
+
+    def wants_json(self):
+        accept = self.request.headers.get("Accept", "")
+        return "application/json" in accept and "text/html" not in accept
+
+    def get_form_kwargs(self):
+        kwargs = super().get_form_kwargs()
+        if "data" in kwargs and self.request.content_type == (
+            "application/json"
+        ):
+            try:
+                kwargs["data"] = json.loads(self.request.body)
+            except ValueError:
+                raise BadRequest("Некорректный JSON.")
+            if not isinstance(kwargs["data"], dict):
+                raise BadRequest("Ожидается JSON-объект.")
+        return kwargs
+
+    def form_invalid(self, form):
+        if self.wants_json():
+            return JsonResponse(
+                {"errors": form.errors.get_json_data()}, status=400
+            )
+        return super().form_invalid(form)
+
+
+class NoteJsonMixin(JsonFormMixin):
+    """
+    JSON-ответ для клиентов, которые просят application/json.
+
+    Вместо перенаправления на страницу успеха такой клиент сразу получает
+    сохранённую заметку.
+    """
+
+    json_status = 200
+
+    def note_json(self, note):
+        return {
+            "id": note.pk,
+            "title": note.title,
+            "text": note.text,
+            "slug": note.slug,
+            "url": reverse("notes:detail", args=(note.slug,)),
+        }
+
+    def form_valid(self, form):
+        response = super().form_valid(form)
+        if self.wants_json():
+            return JsonResponse(
+                self.note_json(self.object), status=self.json_status
+            )
+        return response
+
+
+class NoteCreate(NoteJsonMixin, NoteBase, generic.CreateView):
+    """
+    Добавление заметки.
+
+    Версия при создании не пишется: иначе текст каждой заметки
+    хранился бы дважды. Первая правка сохранит исходное состояние
+    версией 1 (см. notes.revisions.new_revisions).
+    """
 
     template_name = "notes/form.html"
     form_class = NoteForm
+    json_status = 201
 
     def form_valid(self, form):
-        new_note = form.save(commit=False)
-        new_note.author = self.request.user
-        new_note.save()
+        form.instance.author = self.request.user
         return super().form_valid(form)
 
 
-class NoteUpdate(NoteBase, generic.UpdateView):
-    """Редактирование заметки."""
+class NoteUpdate(NoteJsonMixin, NoteBase, generic.UpdateView):
+    """Редактирование заметки; каждая правка сохраняется как версия."""
 
     template_name = "notes/form.html"
     form_class = NoteForm
 
+    @transaction.atomic
+    def form_valid(self, form):
+        response = super().form_valid(form)
+        if "text" in form.changed_data:
+            forget_note_html(form.initial["text"])
+        if form.has_changed():
+            # В initial формы осталась заметка до правки.
+            record_revision(
+                self.object,
+                previous_title=form.initial["title"],
+                previous_text=form.initial["text"],
+            )
+        return response
+
 
-class NoteDelete(NoteBase, generic.DeleteView):
+class NoteDelete(NoteJsonMixin, NoteBase, generic.DeleteView):
     """Удаление заметки."""
 
     template_name = "notes/delete.html"
 
+    def delete(self, request, *args, **kwargs):
+        if not self.wants_json():
+            return super().delete(request, *args, **kwargs)
+        note = self.get_object()
+        data = self.note_json(note)
+        note.delete()
+        return JsonResponse(data)
+
+
+class NoteBulk(JsonFormMixin, NoteBase, generic.FormView):
+    """
+    Удаление или изменение нескольких заметок одним запросом.
+
+    Заметки выбираются одним запросом filter(slug__in=...) среди заметок
+    пользователя, всё выполняется в одной транзакции. Slug чужих и
+    несуществующих заметок пропускаются. Отвечает всегда JSON-ом.
+    """
+
+    form_class = NoteBulkForm
+    http_method_names = ["post"]
+
+    def wants_json(self):
+        return True
+
+    @transaction.atomic
+    def form_valid(self, form):
+        action = form.cleaned_data["action"]
+        notes = self.get_queryset().filter(
+            slug__in=form.cleaned_data["slugs"]
+        )
+        if action == form.DELETE:
+            deleted = notes.only("id").delete()[1]
+            count = deleted.get(self.model._meta.label, 0)
+        else:
+            count = self.update(notes, form.changes)
+        return JsonResponse({"action": action, "count": count})
+
+    def update(self, notes, changes):
+        """Меняет поля заметок и сохраняет их прежнее состояние в истории."""
+        previous = list(notes.only("id", "title", "text"))
+        if not previous:
+            return 0
+        count = notes.update(**changes)
+        if "text" in changes:
+            forget_note_html(*(note.text for note in previous))
+        record_bulk_revisions(previous, changes)
+        return count
+
 
 class NotesList(NoteBase, generic.ListView):
-    """Список всех заметок пользователя."""
+    """
+    Список всех заметок пользователя.
+
+    Заметки выводятся постранично по курсору: id последней показанной
+    заметки. Вместе с индексом (author, id) это делает стоимость
+    страницы зависящей только от её размера.
+    """
 
     template_name = "notes/list.html"
+    cursor_param = "after"
+
+    def get_queryset(self):
+        """Загружаем только поля, которые выводит шаблон."""
+        queryset = (
+            super().get_queryset().only("id", "slug", "title").order_by("id")
+        )
+        cursor = self.request.GET.get(self.cursor_param)
+        if cursor:
+            try:
+                queryset = queryset.filter(id__gt=int(cursor))
+            except ValueError:
+                raise Http404("Некорректный курсор.")
+        return queryset
+
+    def get_context_data(self, **kwargs):
+        page_size = settings.NOTES_COUNT_ON_LIST_PAGE
+        object_list = list(self.object_list[: page_size + 1])
+        next_cursor = None
+        if len(object_list) > page_size:
+            object_list = object_list[:page_size]
+            next_cursor = object_list[-1].pk
+        return super().get_context_data(
+            object_list=object_list,
+            next_cursor=next_cursor,
+            cursor_param=self.cursor_param,
+            **kwargs,
+        )
 
 
 class NoteDetail(NoteBase, generic.DetailView):
-    """Заметка подробно."""
+    """Заметка подробно; текст выводится как Markdown."""
 
     template_name = "notes/detail.html"
+
+    def get_context_data(self, **kwargs):
+        return super().get_context_data(
+            note_html=get_note_html(self.object.text), **kwargs
+        )
+
+
+class NoteRevisions(NoteBase, generic.DetailView):
+    """Список версий заметки."""
+
+    template_name = "notes/revisions.html"
+
+    def get_context_data(self, **kwargs):
+        return super().get_context_data(
+            revisions=self.object.revisions.only(
+                "number", "title", "created", "note_id"
+            ).order_by("-number"),
+            **kwargs,
+        )
+
+
+class NoteRevisionDetail(NoteBase, generic.DetailView):
+    """Версия заметки, восстановленная от ближайшего снимка."""
+
+    template_name = "notes/revision.html"
+
+    def get_context_data(self, **kwargs):
+        revision = rebuild_revision(self.object, self.kwargs["number"])
+        if revision is None:
+            raise Http404("Такой версии заметки нет.")
+        return super().get_context_data(revision=revision, **kwargs)
+
+
+class NoteExport(NoteBase, generic.View):
+    """Выгрузка всех заметок пользователя в JSONL или ZIP с Markdown."""
+
+    formats = {
+        "jsonl": (export_jsonl, "application/jsonl; charset=utf-8"),
+        "zip": (export_zip, "application/zip"),
+    }
+
+    def get(self, request, *args, **kwargs):
+        export_format = request.GET.get("format", "jsonl")
+        if export_format not in self.formats:
+            raise Http404("Неизвестный формат выгрузки.")
+        export, content_type = self.formats[export_format]
+        response = StreamingHttpResponse(
+            export(self.get_queryset().order_by("id")),
+            content_type=content_type,
+        )
+        response["Content-Disposition"] = (
+            f'attachment; filename="notes.{export_format}"'
+        )
+        return response
+
+
+class NoteAutocomplete(NoteBase, generic.View):
+    """
+    Заметки пользователя, у которых заголовок или slug начинается с q.
+
+    Префикс ищется как диапазон строк по индексам (author, slug)
+    и (author, title), а не через LIKE, который SQLite не умеет
+    искать по индексу. Каждый из двух запросов ограничен лимитом.
+    """
+
+    # Больше любого символа, который может стоять после префикса.
+    range_end = "\U0010ffff"
+
+    def prefix_range(self, field, prefix, limit):
+        """Пары (slug, title), у которых поле field начинается с prefix."""
+        return (
+            self.get_queryset()
+            .filter(
+                **{
+                    f"{field}__gte": prefix,
+                    f"{field}__lt": prefix + self.range_end,
+                }
+            )
+            .order_by(field)
+            .values_list("slug", "title")[:limit]
+        )
+
+    def get(self, request, *args, **kwargs):
+        prefix = request.GET.get("q", "").strip()
+        limit = settings.NOTES_AUTOCOMPLETE_LIMIT
+        notes = {}
+        if prefix:
+            slug_prefix = slugify_title(prefix)
+            for field, value in (("slug", slug_prefix), ("title", prefix)):
+                if not value:
+                    continue
+                notes.update(self.prefix_range(field, value, limit))
+        return JsonResponse(
+            {
+                "results": [
+                    {
+                        "slug": slug,
+                        "title": title,
+                        "url": reverse("notes:detail", args=(slug,)),
+                    }
+                    for slug, title in sorted(notes.items())[:limit]
+                ]
+            }
+        )
@@ -1,9 +1,16 @@
+import sys
+import tempfile
 from pathlib import Path
 
 from django.urls import reverse_lazy
 
 BASE_DIR = Path(__file__).resolve().parent.parent
 
+# Общий для обоих проектов пакет monitoring лежит в корне репозитория.
+REPO_DIR = BASE_DIR.parent
+if str(REPO_DIR) not in sys.path:
+    sys.path.append(str(REPO_DIR))
+
 SECRET_KEY = (
     "django-insecure-yipnj$#j!ajarq%k55z4kuf3x79)91h0h42o9!1ho(z=!%mt=#"
 )
@@ -20,10 +27,14 @@ INSTALLED_APPS = [
     "django.contrib.sessions",
     "django.contrib.messages",
     "django.contrib.staticfiles",
+    "monitoring",
     "notes.apps.NotesConfig",
 ]
 
 MIDDLEWARE = [
+    "monitoring.middleware.TimingMiddleware",
+    "monitoring.slow_queries.SlowQueryMiddleware",
+    "monitoring.profiling.ProfilingMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -89,3 +100,38 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
 LOGIN_URL = reverse_lazy("users:login")
 LOGIN_REDIRECT_URL = reverse_lazy("notes:home")
+
+NOTES_COUNT_ON_LIST_PAGE = 100
+
+NOTES_AUTOCOMPLETE_LIMIT = 10
+
+NOTES_REVISION_SNAPSHOT_INTERVAL = 10
+
+NOTES_HTML_CACHE_TIMEOUT = 60 * 60 * 24
+
+NOTES_BULK_LIMIT = 1000
+
+INTERNAL_IPS = ["127.0.0.1"]
+
+# Файлы гистограмм всех процессов; None отключает сбор метрик.
+MONITORING_METRICS_DIR = Path(tempfile.gettempdir()) / "yanote-metrics"
+
+# Запросы к базе дольше этого числа миллисекунд попадают в журнал
+# monitoring.slow_queries; None отключает журнал.
+MONITORING_SLOW_QUERY_MS = 100
+
+# Профили запросов с токеном из manage.py profile_token; None отключает.
+MONITORING_PROFILE_DIR = Path(tempfile.gettempdir()) / "yanote-profiles"
+# Срок действия токена профилирования в секундах.
+MONITORING_PROFILE_MAX_AGE = 60 * 60
+
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "handlers": {
+        "console": {"class": "logging.StreamHandler"},
+    },
+    "loggers": {
+        "monitoring": {"handlers": ["console"], "level": "INFO"},
+    },
+}
@@ -8,6 +8,7 @@ from django.views.generic import CreateView
 urlpatterns = [
     path("", include("notes.urls")),
     path("admin/", admin.site.urls),
+    path("monitoring/", include("monitoring.urls")),
 ]
 
 auth_urls = (